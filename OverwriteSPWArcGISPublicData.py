@@ -6,6 +6,8 @@ import json
 from arcgis.gis import GIS
 from typing import Optional, Tuple
 
+import myfingerprint
+
 def loadConfig() -> dict:
     """
     Load configuration from config.json file.
@@ -259,6 +261,19 @@ def main():
         # Analyze project layers
         analyzeProjectLayers(prj)
         
+        # Skip staging and publishing if the project, the map data and the
+        # publish settings have not changed since the last successful publish
+        fingerprint = None
+        if config.get('skipUnchanged', False):
+            fingerprints = myfingerprint.FingerprintCache()
+            publishSettings = {'serviceName': serviceName,
+                               'mapName': mapName,
+                               'sharing': config['sharing']}
+            fingerprint = myfingerprint.mapFingerprint(m, projectPath, publishSettings)
+            if fingerprints.isUnchanged(serviceName, fingerprint):
+                print(f"{serviceName} data unchanged since last publish, skipping")
+                return
+        
         # Create service definition
         createServiceDefinition(prj, m, sddraft, sd, serviceName)
         
@@ -274,6 +289,10 @@ def main():
         # Configure sharing settings
         configureSharing(fs, shareWithOrg, shareWithEveryone, shareWithGroups)
         
+        # Remember what was published so an unchanged map is skipped next time
+        if fingerprint:
+            fingerprints.record(serviceName, fingerprint, sd)
+        
         print(f"Successfully completed update: {fs.title} (ID: {fs.id})")
         
     except Exception as e:
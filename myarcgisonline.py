@@ -5,21 +5,36 @@
 import configparser
 import ast
 import os
+import shutil
 import sys
 import time
 
 import urllib.request
 import urllib.parse
+import urllib.error
+import http.client
 import json
 import mimetypes
 import gzip
+import hashlib
+import io
 from io import BytesIO
 import string
 import random
-
-from xml.etree import ElementTree as ET
+import re
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import xml.sax
+import xml.sax.handler
+from xml.sax.saxutils import XMLGenerator
 import arcpy
 
+import myfingerprint
+import mytoken
+
 
 def loadConfig():
     """
@@ -40,6 +55,331 @@ def loadConfig():
         raise RuntimeError(f"Failed to load config.json: {e}")
 
 
+_discoveryLock = threading.Lock()
+
+
+def _loadJSON(path):
+    """
+    Read a JSON cache file, returning an empty dict if it is missing or unreadable.
+    """
+    try:
+        with open(path, 'r') as cacheFile:
+            return json.load(cacheFile)
+    except (OSError, ValueError):
+        return {}
+
+
+def _saveJSON(path, data):
+    """
+    Write a JSON cache file, replacing it atomically.
+    """
+    try:
+        with open(path + '.tmp', 'w') as cacheFile:
+            json.dump(data, cacheFile)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print("Warning: Could not write {}: {}".format(path, e))
+
+
+class ConnectionPool(object):
+    """
+    Pool of persistent HTTP/1.1 keep-alive connections.
+    
+    Idle connections are kept per (scheme, host, port) so that repeated
+    requests to the same portal reuse the TCP connection and TLS session
+    instead of paying a new handshake. At most maxsize idle connections are
+    kept per host, and connections idle for longer than idle_timeout seconds
+    are closed instead of being reused. The pool is thread safe.
+    
+    Attributes:
+        created (int): Number of new connections opened
+        reused (int): Number of requests served by an idle connection
+    """
+
+    def __init__(self, maxsize=8, idle_timeout=60):
+        """
+        Args:
+            maxsize (int): Maximum number of idle connections kept per host
+            idle_timeout (float): Seconds after which an idle connection is evicted
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, host, port, fresh=False):
+        """
+        Get a connection to a host, reusing an idle one when possible.
+        
+        Args:
+            scheme (str): 'http' or 'https'
+            host (str): Host name
+            port (int): Port number
+            fresh (bool): Always open a new connection
+            
+        Returns:
+            tuple: (connection, reused) where reused is True for an idle connection
+        """
+        key = (scheme, host, port)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            expired = [conn for conn, last_used in idle if now - last_used > self.idle_timeout]
+            idle[:] = [(conn, last_used) for conn, last_used in idle if now - last_used <= self.idle_timeout]
+            if idle and not fresh:
+                conn = idle.pop()[0]
+                self.reused += 1
+                reused = True
+            else:
+                conn = None
+                self.created += 1
+                reused = False
+
+        for old in expired:
+            old.close()
+
+        if conn is None:
+            conn = self._connect(scheme, host, port)
+        return conn, reused
+
+    def release(self, scheme, host, port, conn):
+        """
+        Return a connection to the pool once its response has been read.
+        
+        Args:
+            scheme (str): 'http' or 'https'
+            host (str): Host name
+            port (int): Port number
+            conn: Connection returned by acquire()
+        """
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host, port), [])
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, last_used in conns:
+                conn.close()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Counts of new and reused connections
+        """
+        return {'created': self.created, 'reused': self.reused}
+
+    def _connect(self, scheme, host, port):
+        connectionClass = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+
+        # Honour the proxy settings urllib.request.urlopen would have used
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and not urllib.request.proxy_bypass(host):
+            proxyParts = urllib.parse.urlsplit(proxy)
+            conn = connectionClass(proxyParts.hostname, proxyParts.port)
+            conn.set_tunnel(host, port)
+            return conn
+
+        return connectionClass(host, port)
+
+
+class FilePart(object):
+    """
+    A byte range of a file on disk, used as multipart upload content without
+    reading the range into memory.
+    """
+
+    def __init__(self, path, offset=0, size=None):
+        """
+        Args:
+            path (str): Full path to the file
+            offset (int): Byte offset of the range in the file
+            size (int, optional): Size of the range in bytes. Defaults to the rest of the file
+        """
+        self.path = path
+        self.offset = offset
+        if size is None:
+            size = os.path.getsize(path) - offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def iter_blocks(self, block_size=1048576):
+        """
+        Generator that yields the range as memoryview slices of a single
+        reusable buffer, so at most block_size bytes are held at once.
+        
+        Args:
+            block_size (int): Size of the read buffer in bytes (default: 1MB)
+            
+        Yields:
+            memoryview: File data blocks
+        """
+        buf = bytearray(min(block_size, self.size) or 1)
+        view = memoryview(buf)
+        remaining = self.size
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            while remaining > 0:
+                read = f.readinto(view[:min(len(buf), remaining)])
+                if not read:
+                    raise IOError("Unexpected end of file in {}".format(self.path))
+                remaining -= read
+                yield view[:read]
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body that streams the form header, the
+    file content and the closing boundary without concatenating them.
+    
+    The body can be iterated more than once, so a request can be retried
+    with the same object. len() returns the exact Content-Length.
+    """
+
+    def __init__(self, head, content, tail):
+        """
+        Args:
+            head (bytes): Form fields and file part headers
+            content (bytes or FilePart): File content
+            tail (bytes): Closing boundary
+        """
+        self.head = head
+        self.content = content
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.head) + len(self.content) + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        if isinstance(self.content, FilePart):
+            for block in self.content.iter_blocks():
+                yield block
+        else:
+            yield memoryview(self.content)
+        yield self.tail
+
+
+class JSONArrayStream(object):
+    """
+    Iterator over the elements of one top-level array of a streamed JSON object.
+    
+    The object is parsed incrementally from a text stream with
+    json.JSONDecoder.raw_decode, reading more of the stream only when the
+    next value is incomplete. Each array element is yielded as soon as it
+    has been read, and consumed text is discarded, so memory use is bounded
+    by the largest element rather than the whole response. The other
+    members of the object are stored in meta as they are passed.
+    
+    Attributes:
+        key (str): Name of the array iterated over
+        meta (dict): Other members of the JSON object read so far
+    """
+
+    def __init__(self, stream, key, on_close=None, chunk_size=65536):
+        """
+        Args:
+            stream: Text stream containing a JSON object
+            key (str): Name of the top-level array to iterate over
+            on_close (callable, optional): Called once the stream is finished with
+            chunk_size (int): Number of characters read from the stream at a time
+        """
+        self.key = key
+        self.meta = {}
+        self._stream = stream
+        self._on_close = on_close
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        try:
+            self._expect('{')
+            while self._peek() != '}':
+                name = self._value()
+                self._expect(':')
+                if name == self.key and self._peek() == '[':
+                    self._pos += 1
+                    while self._peek() != ']':
+                        yield self._value()
+                        if self._peek() == ',':
+                            self._pos += 1
+                    self._pos += 1
+                else:
+                    self.meta[name] = self._value()
+                if self._peek() == ',':
+                    self._pos += 1
+            self._pos += 1
+
+            # Drain the rest of the body so the connection can be reused
+            self._stream.read()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Finish with the stream. A stream that was not read to the end is closed.
+        """
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+
+    def _fill(self, size=None):
+        # Discard consumed text, then read at least size more characters
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        data = self._stream.read(size or self._chunk_size)
+        if not data:
+            self._eof = True
+        self._buf += data
+
+    def _peek(self):
+        # Next non-whitespace character, reading more of the stream as needed
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof:
+                raise ValueError("Unexpected end of JSON response")
+            self._fill()
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError("Expected '{}' at position {} of JSON response".format(char, self._pos))
+        self._pos += 1
+
+    def _value(self):
+        # Decode the next complete value. A value ending exactly at the end of
+        # the buffer may be a truncated number, so it is only accepted once
+        # more text follows it or the stream has ended.
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Grow reads geometrically so large values are not re-parsed too often
+            self._fill(max(self._chunk_size, len(self._buf) - self._pos))
+
+
 class AGOLHandler(object):
     """
     Handles interactions with ArcGIS Online (AGOL) for managing hosted feature services.
@@ -49,7 +389,7 @@ class AGOLHandler(object):
 
     """
 
-    def __init__(self, username, password, serviceName, folderName, config=None):
+    def __init__(self, username, password, serviceName, folderName, config=None, pool=None):
         """
         Initialize the AGOL handler with user credentials and service information.
         
@@ -59,9 +399,15 @@ class AGOLHandler(object):
             serviceName (str): Name of the service to manage
             folderName (str): Name of the folder containing the service (use "None" for root)
             config (dict, optional): Configuration dictionary. If None, will load from config.json
+            pool (ConnectionPool, optional): Connection pool to share with other handlers.
+                                             If None, a new pool is created from config
         """
         if config is None:
             config = loadConfig()
+
+        if pool is None:
+            pool = ConnectionPool(config.get('poolMaxSize', 8), config.get('poolIdleTimeout', 60))
+        self.pool = pool
             
         self.headers = {
             'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
@@ -72,20 +418,26 @@ class AGOLHandler(object):
         self.base_url = config.get('baseUrl', "https://www.arcgis.com/sharing/rest")
         self.config = config
         self.serviceName = serviceName
-        self.token = self.getToken(username, password)
-        self.itemID = self.findItem("Feature Service")
-        self.SDitemID = self.findItem("Service Definition")
+        self._file_hashes = {}
+        self.tokens = mytoken.getTokenManager()
+        self.getToken(username, password)
         self.folderName = folderName
-        self.folderID = self.findFolder()
+        self._rediscovered = False
+        self.itemID, self.SDitemID, self.folderID = self.discover()
 
-    def getToken(self, username, password, exp=60):
+    def getToken(self, username, password, exp=60, invalidToken=None):
         """
-        Generate an authentication token for ArcGIS Online API access.
+        Get an authentication token for ArcGIS Online API access.
+        
+        Tokens come from the shared token manager, so a new token is only
+        generated when there is no cached token for this portal and user, the
+        cached one is about to expire, or the portal rejected it.
         
         Args:
             username (str): ArcGIS Online username
             password (str): ArcGIS Online password
             exp (int): Token expiration time in minutes (default: 60)
+            invalidToken (str, optional): Token the portal just rejected
             
         Returns:
             str: Authentication token for API requests
@@ -103,46 +455,188 @@ class AGOLHandler(object):
 
         token_url = '{}/generateToken'.format(self.base_url)
 
-        token_response = self.url_request(token_url, query_dict, 'POST')
+        def fetch():
+            token_response = self.url_request(token_url, query_dict, 'POST')
 
-        if "token" not in token_response:
-            print(token_response['error'])
-            sys.exit()
-        else:
-            return token_response['token']
+            if "token" not in token_response:
+                print(token_response['error'])
+                sys.exit()
+            else:
+                expires = token_response.get('expires', (time.time() + exp * 60) * 1000)
+                return token_response['token'], expires / 1000.0
 
-    def findItem(self, findType):
+        return self.tokens.getToken(self.base_url, username, fetch, invalidToken)
+
+    @property
+    def token(self):
         """
-        Find the item ID of a specific service type owned by the current user.
+        str: Current authentication token, renewed ahead of its expiry
+        """
+        return self.getToken(self.username, self.password)
+
+    def discover(self, refresh=False):
+        """
+        Resolve the Feature Service ID, Service Definition ID and folder ID.
+        
+        Both item types are found with a single search, run concurrently with
+        the user content listing used to find the folder. The resolved IDs are
+        cached per service in the file named by the 'discoveryCachePath'
+        config key for 'discoveryCacheTTL' seconds, so later runs do not
+        search at all. If the portal rejects a cached ID, upload() and
+        publish() search again once through rediscover().
         
         Args:
-            findType (str): Type of item to search for (e.g., "Feature Service", "Service Definition")
+            refresh (bool): Ignore any cached IDs and search again
             
         Returns:
-            str: Item ID of the found service
+            tuple: (Feature Service item ID, Service Definition item ID, folder ID)
             
         Raises:
-            SystemExit: If no matching service is found
+            SystemExit: If the service or folder cannot be found
+        """
+
+        cachePath = self.config.get('discoveryCachePath')
+        ttl = float(self.config.get('discoveryCacheTTL', 86400))
+        cacheKey = "{}|{}|{}|{}".format(self.base_url, self.username, self.serviceName, self.folderName)
+
+        with _discoveryLock:
+            cache = _loadJSON(cachePath) if cachePath else {}
+        cached = cache.get(cacheKey)
+        if cached and not refresh and time.time() - cached['time'] < ttl:
+            print("found {} items in cache".format(self.serviceName))
+            return cached['itemID'], cached['SDitemID'], cached['folderID']
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            items = executor.submit(self.findItems, ["Feature Service", "Service Definition"])
+            folder = executor.submit(self.findFolder)
+            itemIDs = items.result()
+            folderID = folder.result()
+
+        if cachePath:
+            with _discoveryLock:
+                cache = _loadJSON(cachePath)
+                cache[cacheKey] = {'itemID': itemIDs["Feature Service"],
+                                   'SDitemID': itemIDs["Service Definition"],
+                                   'folderID': folderID,
+                                   'time': time.time()}
+                _saveJSON(cachePath, cache)
+
+        return itemIDs["Feature Service"], itemIDs["Service Definition"], folderID
+
+    def search(self, query, num=100, start=1, prefetch=2):
+        """
+        Iterate over every item matching a portal search, across all result pages.
+        
+        The first page is requested directly. The following pages, whose
+        start positions follow from num and the reported total, are requested
+        on a thread pool up to 'prefetch' pages ahead while the caller is
+        still consuming the current one. Paging stops when a page reports
+        nextStart -1. Breaking out of the loop stops the search; pages that
+        have not been requested yet are never sent.
+        
+        Args:
+            query (str): Portal search query (the 'q' parameter)
+            num (int): Number of results per page (maximum 100)
+            start (int): 1-based position of the first result
+            prefetch (int): Number of pages requested ahead of the caller
+            
+        Yields:
+            dict: Search result items
+            
+        Raises:
+            RuntimeError: If the portal returns an error for a page
         """
 
         searchURL = self.base_url + "/search"
 
-        query_dict = {'f': 'json',
-                      'token': self.token,
-                      'q': "title:\"" + self.serviceName + "\"AND owner:\"" +
-                      self.username + "\" AND type:\"" + findType + "\""}
+        def fetch(pageStart):
+            query_dict = {'f': 'json',
+                          'token': self.token,
+                          'q': query,
+                          'num': num,
+                          'start': pageStart}
+            jsonResponse = self.url_request(searchURL, query_dict, 'POST')
+            if 'error' in jsonResponse:
+                raise RuntimeError("Search failed: {}".format(jsonResponse['error']))
+            return jsonResponse
+
+        jsonResponse = fetch(start)
+        nextStart = jsonResponse.get('nextStart', -1)
+        starts = iter(range(nextStart, jsonResponse.get('total', 0) + 1, num) if nextStart > 0 else [])
+
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        pending = deque(executor.submit(fetch, pageStart) for pageStart in islice(starts, prefetch))
+        try:
+            for it in jsonResponse.get('results', []):
+                yield it
+
+            while pending:
+                jsonResponse = pending.popleft().result()
+                if jsonResponse.get('nextStart', -1) > 0:
+                    for pageStart in islice(starts, 1):
+                        pending.append(executor.submit(fetch, pageStart))
+                else:
+                    # Last page; drop any pages requested beyond it
+                    for future in pending:
+                        future.cancel()
+                    pending.clear()
+
+                for it in jsonResponse.get('results', []):
+                    yield it
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def findItems(self, findTypes):
+        """
+        Find the item IDs of several item types owned by the current user
+        with a single paged search, stopping at the first exact title match
+        of each type.
+        
+        Args:
+            findTypes (list): Types of item to search for (e.g., ["Feature Service", "Service Definition"])
+            
+        Returns:
+            dict: Item ID of the found service, keyed by item type
+            
+        Raises:
+            SystemExit: If no matching service is found for one of the types
+        """
 
-        jsonResponse = self.url_request(searchURL, query_dict, 'POST')
+        typeQuery = " OR ".join("type:\"" + findType + "\"" for findType in findTypes)
+        query = ("title:\"" + self.serviceName + "\" AND owner:\"" +
+                 self.username + "\" AND (" + typeQuery + ")")
 
-        if jsonResponse['total'] == 0:
+        itemIDs = {}
+        for it in self.search(query):
+            if it["title"] == self.serviceName and it["type"] in findTypes and it["type"] not in itemIDs:
+                print("found {} : {}".format(it["type"], it["id"]))
+                itemIDs[it["type"]] = it["id"]
+                if len(itemIDs) == len(findTypes):
+                    break
+
+        if len(itemIDs) != len(findTypes):
             print("\nCould not find a service to update. Check the service name in the settings.ini")
             sys.exit()
-        else:
-            resultList = jsonResponse['results']
-            for it in resultList:
-                if it["title"] == self.serviceName:
-                    print("found {} : {}".format(findType, it["id"]))
-                    return it["id"]
+
+        return itemIDs
+
+    def findItem(self, findType):
+        """
+        Find the item ID of a specific service type owned by the current user.
+        
+        Args:
+            findType (str): Type of item to search for (e.g., "Feature Service", "Service Definition")
+            
+        Returns:
+            str: Item ID of the found service
+            
+        Raises:
+            SystemExit: If no matching service is found
+        """
+
+        return self.findItems([findType])[findType]
 
     def findFolder(self, folderName=None):
         """
@@ -178,12 +672,24 @@ class AGOLHandler(object):
         print("-- If your content is in the root folder, change the folder name to 'None'")
         sys.exit()
 
-    def upload(self, fileName):
+    def upload(self, fileName, resume=None, fingerprint=None):
         """
         Upload and overwrite the Service Definition (.SD) file on ArcGIS Online.
         
+        In resumable mode the item ID, part size, file hash and accepted part
+        numbers are journaled next to the .SD file. A re-run against the same
+        file skips the parts the portal already accepted and goes straight
+        to commit. If the portal no longer accepts the journaled upload, for
+        example because it expired or was already committed, the journal is
+        dropped and the file is uploaded again from the start.
+        
         Args:
             fileName (str): Full path to the .SD file to upload
+            resume (bool, optional): Use the upload journal. If None, uses the
+                                     'resumeUploads' config setting
+            fingerprint (str, optional): Fingerprint of the data the .SD was staged
+                                         from. Stored in the journal, and a journal
+                                         with a different fingerprint is not resumed
             
         Returns:
             bool: True if upload is successful, False otherwise
@@ -192,91 +698,311 @@ class AGOLHandler(object):
             SystemExit: If upload fails or encounters errors
         """
 
-        updateURL = '{}/content/users/{}/{}/items/{}/update'.format(self.base_url, self.username,
-                                                                    self.folderID, self.SDitemID)
-
-        query_dict = {"filename": fileName,
-                      "type": "Service Definition",
-                      "title": self.serviceName,
-                      "f": "json",
-                      'multipart': 'true',
-                      "token": self.token}
-        
-        details = {'filename': fileName}
-        add_item_res = self.url_request(updateURL, query_dict, "POST", "", details)
+        if resume is None:
+            resume = self.config.get('resumeUploads', False)
+
+        journal = self.load_journal(fileName, fingerprint) if resume else None
+        resumed = journal is not None
+
+        if journal is None:
+            updateURL = '{}/content/users/{}/{}/items/{}/update'.format(self.base_url, self.username,
+                                                                        self.folderID, self.SDitemID)
+
+            query_dict = {"filename": fileName,
+                          "type": "Service Definition",
+                          "title": self.serviceName,
+                          "f": "json",
+                          'multipart': 'true',
+                          "token": self.token}
+
+            details = {'filename': fileName}
+            add_item_res = self.url_request(updateURL, query_dict, "POST", "", details)
+            if 'id' not in add_item_res:
+                if self.rediscover(add_item_res):
+                    return self.upload(fileName, resume, fingerprint)
+                print("\n.sd file could not be updated. Check the errors and try again.\n")
+                print(add_item_res)
+                sys.exit()
+            item_id = add_item_res['id']
+
+            if resume:
+                journal = {'itemID': item_id,
+                           'partSize': int(self.config.get('partSize', 10000000)),
+                           'fileHash': self._file_hash(fileName),
+                           'fingerprint': fingerprint,
+                           'time': time.time(),
+                           'parts': []}
+                _saveJSON(self._journal_path(fileName), journal)
+        else:
+            item_id = journal['itemID']
+            print("resuming upload of {}: {} part(s) already uploaded".format(fileName, len(journal['parts'])))
 
-        itemPartJSON = self._add_part(fileName, add_item_res['id'], "Service Definition")
+        itemPartJSON = self._add_part(fileName, item_id, "Service Definition", journal)
 
         if "success" in itemPartJSON:
             itemPartID = itemPartJSON['id']
 
             commit_response = self.commit(itemPartID)
 
-            # valid states: partial | processing | failed | completed
-            status = 'processing'
-            while status == 'processing' or status == 'partial':
-                status = self.item_status(itemPartID)['status']
-                time.sleep(1.5)
+            if "success" not in commit_response:
+                # The parts can not be committed again, so the journal is useless
+                if journal is not None:
+                    self.discard_journal(fileName)
+                if resumed:
+                    print("resumed upload of {} could not be committed, starting over".format(fileName))
+                    return self.upload(fileName, resume, fingerprint)
+                print("\n.sd file upload could not be committed. Check the errors and try again.\n")
+                print(commit_response)
+                sys.exit()
+
+            job = self.wait_for_job(itemPartID)
+
+            if journal is not None:
+                self.discard_journal(fileName)
 
-            print("updated SD:   {}".format(itemPartID))
+            if job['status'] != 'completed':
+                print("\n.sd file upload returned status {}.\n".format(job['status']))
+                sys.exit()
+
+            print("updated SD:   {} ({} polls, {:.1f}s)".format(itemPartID, job['polls'], job['elapsed']))
             return True
 
         else:
+            # Parts that failed transiently are retried by the next run, but
+            # an upload the portal rejects outright can not be resumed
+            if journal is not None and self._item_rejected(itemPartJSON):
+                self.discard_journal(fileName)
+                if resumed:
+                    print("resumed upload of {} was rejected, starting over".format(fileName))
+                    return self.upload(fileName, resume, fingerprint)
             print("\n.sd file not uploaded. Check the errors and try again.\n")
             print(itemPartJSON)
             sys.exit()
 
-    def _add_part(self, file_to_upload, item_id, upload_type=None):
+    def rediscover(self, response):
+        """
+        Search for the service items again after the portal rejected an item ID.
+        
+        The IDs may come from the discovery cache and refer to items that
+        were since deleted or replaced. The search is done at most once per
+        handler.
+        
+        Args:
+            response (dict): Response of the failed request
+            
+        Returns:
+            bool: True if the search found different IDs, so the failed
+                  request is worth repeating
+        """
+
+        if self._rediscovered or not self._item_rejected(response):
+            return False
+        self._rediscovered = True
+
+        print("{} items were rejected, searching again".format(self.serviceName))
+        discovered = self.discover(refresh=True)
+        changed = discovered != (self.itemID, self.SDitemID, self.folderID)
+        self.itemID, self.SDitemID, self.folderID = discovered
+        return changed
+
+    def _item_rejected(self, response):
+        """
+        Check whether a request failed because of the state of the item,
+        such as an unknown, expired or already committed upload, rather than
+        because of a transient server or network error.
+        
+        Args:
+            response (dict): Response of the failed request
+            
+        Returns:
+            bool: True if repeating the request can not succeed
+        """
+
+        error = response.get('error')
+        return isinstance(error, dict) and error.get('code') in (400, 403, 404)
+
+    def load_journal(self, fileName, fingerprint=None):
+        """
+        Load the upload journal of a .SD file if it can be resumed.
+        
+        The journal is only returned when it belongs to this handler's SD item,
+        its part size and file hash still match the file on disk, it is not
+        older than the 'journalMaxAge' config setting (seconds) and, if a
+        fingerprint is given, the .SD was staged from the same data. A stale
+        journal is removed.
+        
+        Args:
+            fileName (str): Full path to the .SD file
+            fingerprint (str, optional): Fingerprint of the data about to be published
+            
+        Returns:
+            dict: The journal, or None if there is no resumable upload
+        """
+
+        journalPath = self._journal_path(fileName)
+        if not os.path.exists(journalPath) or not os.path.exists(fileName):
+            return None
+
+        try:
+            with open(journalPath, 'r') as journalFile:
+                journal = json.load(journalFile)
+        except (OSError, ValueError):
+            return None
+
+        if (journal.get('itemID') != self.SDitemID or
+                journal.get('partSize') != int(self.config.get('partSize', 10000000)) or
+                journal.get('fileHash') != self._file_hash(fileName)):
+            return None
+
+        if fingerprint is not None and journal.get('fingerprint') != fingerprint:
+            return None
+
+        # The portal discards multipart uploads that are not committed in time
+        if time.time() - journal.get('time', 0) > float(self.config.get('journalMaxAge', 21600)):
+            self.discard_journal(fileName)
+            return None
+
+        return journal
+
+    def discard_journal(self, fileName):
+        """
+        Remove the upload journal of a .SD file, if there is one.
+        
+        Args:
+            fileName (str): Full path to the .SD file
+        """
+
+        try:
+            os.remove(self._journal_path(fileName))
+        except FileNotFoundError:
+            pass
+
+    def _journal_path(self, fileName):
+        return fileName + '.upload.json'
+
+    def _file_hash(self, fileName):
+        """
+        SHA-256 of a file, cached for as long as its size and mtime are unchanged.
+        
+        Args:
+            fileName (str): Full path to the file
+            
+        Returns:
+            str: Hex digest of the file content
+        """
+
+        stat = os.stat(fileName)
+        key = (fileName, stat.st_size, stat.st_mtime)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = myfingerprint.fileHash(fileName)
+        return self._file_hashes[key]
+
+    def _add_part(self, file_to_upload, item_id, upload_type=None, journal=None):
         """
         Upload a large file to ArcGIS Online using multipart upload.
         
-        This method breaks large files into 10MB chunks and uploads them sequentially.
-        This approach is necessary for large Service Definition files that exceed
-        standard upload size limits.
+        This method breaks large files into fixed size parts and uploads them
+        concurrently on a bounded thread pool. Each part is retried on its own,
+        so a single failed request does not restart the whole file. The parts
+        are assembled in partNum order by the commit call made in upload().
+        
+        The part size, number of upload threads and per-part retry count are
+        read from the 'partSize', 'uploadWorkers' and 'partRetries' config keys.
         
         Args:
             file_to_upload (str): Full path to the file to upload
             item_id (str): ID of the item being updated
             upload_type (str, optional): Type of upload (e.g., "Service Definition")
+            journal (dict, optional): Upload journal. Parts listed in it are
+                                      skipped and accepted parts are added to it
             
         Returns:
-            dict: Response from the final upload part containing upload status
+            dict: Response from the last upload part, or the response of the
+                  first part that could not be uploaded
         """
 
-        def read_in_chunks(file_object, chunk_size=10000000):
-            """
-            Generator that reads a file in chunks of specified size.
-            
-            Args:
-                file_object: Open file object to read from
-                chunk_size (int): Size of each chunk in bytes (default: 10MB)
-                
-            Yields:
-                bytes: File data chunks
-            """
-            while True:
-                data = file_object.read(chunk_size)
-                if not data:
-                    break
-                yield data
-
         url = '{}/content/users/{}/items/{}/addPart'.format(self.base_url, self.username, item_id)
 
-        with open(file_to_upload, 'rb') as f:
-            for part_num, piece in enumerate(read_in_chunks(f), start=1):
-                title = os.path.basename(file_to_upload)
-                files = {"file": {"filename": file_to_upload, "content": piece}}
-                params = {
-                    'f': "json",
-                    'token': self.token,
-                    'partNum': part_num,
-                    'title': title,
-                    'itemType': 'file',
-                    'type': upload_type
-                }
-
-                request_data, request_headers = self.multipart_request(params, files)
+        part_size = int(self.config.get('partSize', 10000000))
+        max_workers = int(self.config.get('uploadWorkers', 4))
+        retries = int(self.config.get('partRetries', 3))
+
+        file_size = os.path.getsize(file_to_upload)
+        parts = [(part_num, offset, min(part_size, file_size - offset))
+                 for part_num, offset in enumerate(range(0, file_size, part_size), start=1)]
+
+        if not parts:
+            return {'error': "{} is empty".format(file_to_upload)}
+
+        done = set(journal['parts']) if journal is not None else set()
+        responses = {part_num: {'success': True, 'id': item_id} for part_num in done}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._upload_part, url, file_to_upload, part_num,
+                                       offset, size, upload_type, retries): part_num
+                       for part_num, offset, size in parts if part_num not in done}
+
+            for future in as_completed(futures):
+                part_num = futures[future]
+                responses[part_num] = future.result()
+                if journal is not None and "success" in responses[part_num]:
+                    journal['parts'].append(part_num)
+                    _saveJSON(self._journal_path(file_to_upload), journal)
+
+        for part_num, offset, size in parts:
+            if "success" not in responses[part_num]:
+                print("part {} of {} failed to upload".format(part_num, len(parts)))
+                return responses[part_num]
+
+        return responses[len(parts)]
+
+    def _upload_part(self, url, file_to_upload, part_num, offset, size, upload_type=None, retries=0):
+        """
+        Upload a single part of a multipart upload, retrying on failure.
+        
+        Args:
+            url (str): addPart URL of the item being updated
+            file_to_upload (str): Full path to the file to upload
+            part_num (int): 1-based part number
+            offset (int): Byte offset of the part in the file
+            size (int): Size of the part in bytes
+            upload_type (str, optional): Type of upload (e.g., "Service Definition")
+            retries (int): Number of times to retry a failed part
+            
+        Returns:
+            dict: Response from the addPart request
+        """
+
+        title = os.path.basename(file_to_upload)
+        piece = FilePart(file_to_upload, offset, size)
+        files = {"file": {"filename": file_to_upload, "content": piece}}
+
+        for attempt in range(retries + 1):
+            # Rebuilt on every attempt so a retry picks up a renewed token
+            params = {
+                'f': "json",
+                'token': self.token,
+                'partNum': part_num,
+                'title': title,
+                'itemType': 'file',
+                'type': upload_type
+            }
+
+            request_data, request_headers = self.multipart_request(params, files)
+
+            try:
                 resp = self.url_request(url, request_data, "MULTIPART", request_headers)
+            except (urllib.error.URLError, OSError, http.client.HTTPException, ValueError) as e:
+                # A connection dropped mid-response ends in IncompleteRead or truncated JSON
+                resp = {'error': str(e)}
+
+            if "success" in resp:
+                break
+
+            if mytoken.isInvalidTokenError(resp):
+                self.getToken(self.username, self.password, invalidToken=params['token'])
+            elif attempt < retries:
+                time.sleep(2 ** attempt)
 
         return resp
 
@@ -301,6 +1027,56 @@ class AGOLHandler(object):
 
         return self.url_request(url, parameters)
 
+    def wait_for_job(self, item_id, jobId=None, timeout=None, verbose=False):
+        """
+        Poll the status of an uploaded item or publishing job until it finishes.
+        
+        Polling starts fast and backs off exponentially up to a cap, with
+        random jitter, so short jobs are noticed quickly and long ones do not
+        flood the portal with status requests. The delays and the overall
+        deadline come from the 'pollInitialDelay', 'pollMaxDelay',
+        'pollBackoff' and 'pollTimeout' config keys.
+        
+        Args:
+            item_id (str): ID of the item to check status for
+            jobId (str, optional): Specific job ID to check (for publishing operations)
+            timeout (float, optional): Seconds to wait before giving up.
+                                       If None, uses the 'pollTimeout' config setting
+            verbose (bool): Print each status returned
+            
+        Returns:
+            dict: 'status' (failed | completed | timeout), 'polls' (number of
+                  status requests) and 'elapsed' (seconds until the job finished)
+        """
+
+        delay = float(self.config.get('pollInitialDelay', 0.5))
+        maxDelay = float(self.config.get('pollMaxDelay', 30))
+        backoff = float(self.config.get('pollBackoff', 1.5))
+        if timeout is None:
+            timeout = float(self.config.get('pollTimeout', 3600))
+
+        start = time.time()
+        polls = 0
+        while True:
+            # valid states: partial | processing | failed | completed
+            statusJSON = self.item_status(item_id, jobId)
+            status = statusJSON.get('status', 'failed')
+            polls += 1
+            if verbose:
+                print("  {}".format(status))
+
+            elapsed = time.time() - start
+            if status not in ('processing', 'partial'):
+                break
+            if elapsed >= timeout:
+                status = 'timeout'
+                break
+
+            time.sleep(min(delay * random.uniform(0.8, 1.2), timeout - elapsed))
+            delay = min(delay * backoff, maxDelay)
+
+        return {'status': status, 'polls': polls, 'elapsed': time.time() - start}
+
     def commit(self, item_id):
         """
         Commit a multipart upload to finalize the file upload process.
@@ -346,23 +1122,24 @@ class AGOLHandler(object):
                       'token': self.token}
 
         jsonResponse = self.url_request(publishURL, query_dict, 'POST')
+        if 'error' in jsonResponse and self.rediscover(jsonResponse):
+            return self.publish()
+
         try:
             if 'jobId' in jsonResponse['services'][0]:
                 jobID = jsonResponse['services'][0]['jobId']
 
-                # valid states: partial | processing | failed | completed
-                status = 'processing'
                 print("Checking the status of publish..")
-                while status == 'processing' or status == 'partial':
-                    status = self.item_status(self.SDitemID, jobID)['status']
-                    print("  {}".format(status))
-                    time.sleep(2)
+                job = self.wait_for_job(self.SDitemID, jobID, verbose=True)
+                status = job['status']
 
                 if status == 'completed':
-                    print("item finished published")
+                    print("item finished published ({} polls, {:.1f}s)".format(job['polls'], job['elapsed']))
                     return jsonResponse['services'][0]['serviceItemId']
                 if status == 'failed':
-                    raise("Status of publishing returned FAILED.")
+                    raise RuntimeError("Status of publishing returned FAILED.")
+                if status == 'timeout':
+                    raise RuntimeError("Publishing did not finish within {:.0f}s.".format(job['elapsed']))
 
         except Exception as e:
             print("Problem trying to check publish status. Might be further errors.")
@@ -426,30 +1203,24 @@ class AGOLHandler(object):
             Automatic retry on failure, with configurable retry count
         """
 
-        if request_type == 'GET':
-            req = urllib.request.Request('?'.join((in_url, urllib.parse.urlencode(request_parameters))))
-        elif request_type == 'MULTIPART':
-            req = urllib.request.Request(in_url, request_parameters)
-        else:
-            req = urllib.request.Request(
-                in_url, urllib.parse.urlencode(request_parameters).encode('utf-8'), self.headers)
-
-        if additional_headers:
-            for key, value in list(additional_headers.items()):
-                req.add_header(key, value)
-        req.add_header('Accept-encoding', 'gzip')
-
-        response = urllib.request.urlopen(req)
-
-        if response.info().get('Content-Encoding') == 'gzip':
-            buf = BytesIO(response.read())
-            with gzip.GzipFile(fileobj=buf) as gzip_file:
-                response_bytes = gzip_file.read()
-        else:
-            response_bytes = response.read()
-
-        response_text = response_bytes.decode('UTF-8')
-        response_json = json.loads(response_text)
+        def send(request_parameters):
+            method, url, body, headers = self._build_request(in_url, request_parameters,
+                                                             request_type, additional_headers)
+            response, release = self._send(method, url, body, headers)
+            try:
+                # Decompress and decode straight from the socket
+                return json.load(self._text_stream(response))
+            finally:
+                release()
+
+        response_json = send(request_parameters)
+
+        # Re-issue the request once with a new token if the portal rejected it
+        if (mytoken.isInvalidTokenError(response_json) and isinstance(request_parameters, dict)
+                and request_parameters.get('token')):
+            request_parameters = dict(request_parameters, token=self.getToken(
+                self.username, self.password, invalidToken=request_parameters['token']))
+            response_json = send(request_parameters)
 
         if not response_json or "error" in response_json:
             rerun = False
@@ -465,9 +1236,153 @@ class AGOLHandler(object):
 
         return response_json
 
+    def url_request_iter(self, in_url, request_parameters, key, request_type='GET',
+                         additional_headers=None):
+        """
+        Make an HTTP request and iterate over one large array of the JSON response.
+        
+        The response is decompressed and parsed incrementally while it is
+        read from the socket, so only one element of the array is held in
+        memory at a time. This suits large 'results' (search) and 'features'
+        (query) arrays. The other members of the response object, including
+        any 'error', are collected in the iterator's meta dict.
+        
+        Args:
+            in_url (str): Target URL for the API request
+            request_parameters (dict): Parameters to include in the request
+            key (str): Name of the top-level array to iterate over
+            request_type (str): HTTP method - 'GET' or 'POST'
+            additional_headers (dict, optional): Additional HTTP headers
+            
+        Returns:
+            JSONArrayStream: Iterator over the elements of the array
+        """
+
+        method, url, body, headers = self._build_request(in_url, request_parameters,
+                                                         request_type, additional_headers)
+        response, release = self._send(method, url, body, headers)
+        return JSONArrayStream(self._text_stream(response), key, release)
+
+    def _build_request(self, in_url, request_parameters, request_type, additional_headers=None):
+        """
+        Build the method, URL, body and headers of a REST API request.
+        
+        Returns:
+            tuple: (method, url, body, headers)
+        """
+
+        if request_type == 'GET':
+            method, url, body = 'GET', '?'.join((in_url, urllib.parse.urlencode(request_parameters))), None
+            headers = {}
+        elif request_type == 'MULTIPART':
+            method, url, body = 'POST', in_url, request_parameters
+            headers = {}
+        else:
+            method, url, body = 'POST', in_url, urllib.parse.urlencode(request_parameters).encode('utf-8')
+            headers = dict(self.headers)
+
+        if additional_headers:
+            headers.update(additional_headers)
+        headers['Accept-encoding'] = 'gzip'
+
+        return method, url, body, headers
+
+    def _text_stream(self, response):
+        """
+        Wrap a response in a text stream that decompresses gzip on the fly.
+        
+        Args:
+            response (http.client.HTTPResponse): Response with an unread body
+            
+        Returns:
+            io.TextIOWrapper: UTF-8 text stream over the response body
+        """
+
+        stream = response
+        if response.getheader('Content-Encoding') == 'gzip':
+            stream = gzip.GzipFile(fileobj=response)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    def _send(self, method, url, body, headers, max_redirects=5):
+        """
+        Send a request over a pooled keep-alive connection.
+        
+        A request that fails on a reused connection (the server closed it while
+        idle) is sent once more on a new connection. Redirects are followed
+        the way urllib.request.urlopen follows them.
+        
+        The body of the returned response is left unread so it can be
+        streamed. The returned release function must be called once the
+        body has been read; it hands the connection back to the pool, or
+        closes it if the body was not read to the end.
+        
+        Args:
+            method (str): HTTP method
+            url (str): Full request URL
+            body: Request body (bytes, iterable or None)
+            headers (dict): Request headers
+            max_redirects (int): Maximum number of redirects to follow
+            
+        Returns:
+            tuple: (http.client.HTTPResponse, release function)
+            
+        Raises:
+            urllib.error.HTTPError: If the server returns an error status
+        """
+
+        for redirect in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            scheme = parts.scheme
+            host = parts.hostname
+            port = parts.port or (443 if scheme == 'https' else 80)
+            path = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+            fresh = False
+            while True:
+                conn, reused = self.pool.acquire(scheme, host, port, fresh)
+                try:
+                    conn.request(method, path, body, headers)
+                    response = conn.getresponse()
+                    break
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    fresh = True
+
+            def release(conn=conn, scheme=scheme, host=host, port=port, response=response):
+                if response.isclosed() and not response.will_close:
+                    self.pool.release(scheme, host, port, conn)
+                else:
+                    conn.close()
+
+            location = response.getheader('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.read()
+                release()
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303 or (response.status in (301, 302) and method == 'POST'):
+                    method, body = 'GET', None
+                    headers = {key: value for key, value in headers.items()
+                               if key.lower() not in ('content-type', 'content-length')}
+                continue
+
+            if response.status >= 400:
+                response_bytes = response.read()
+                release()
+                raise urllib.error.HTTPError(url, response.status, response.reason,
+                                             response.msg, BytesIO(response_bytes))
+
+            return response, release
+
+        raise urllib.error.HTTPError(url, response.status, "Too many redirects",
+                                     response.msg, BytesIO(b""))
+
     def multipart_request(self, params, files):
         """ Uploads files as multipart/form-data. files is a dict and must
-            contain the required keys "filename" and "content". The "mimetype"
+            contain the required keys "filename" and "content". Binary content
+            (bytes or a FilePart) is returned as a streaming MultipartBody
+            rather than a single bytes object. The "mimetype"
             value is optional and if not specified will use mimetypes.guess_type
             to determine the type or use type application/octet-stream. params
             is a dict containing the parameters to be passed in the HTTP
@@ -506,13 +1421,14 @@ class AGOLHandler(object):
                 file_lines.append("")
                 # Handle binary content properly
                 content = value.get("content")
-                if isinstance(content, bytes):
-                    # For binary content, we need to build the request differently
-                    text_part = "\r\n".join(file_lines).encode('utf-8')
-                    boundary_end = "\r\n--{}--\r\n".format(boundary).encode('utf-8')
-                    request_data = text_part + b"\r\n" + content + boundary_end
+                if isinstance(content, (bytes, FilePart)):
+                    # Stream binary content instead of copying it into the body
+                    file_lines.append("")
+                    head = "\r\n".join(file_lines).encode('utf-8')
+                    tail = "\r\n--{}--\r\n".format(boundary).encode('utf-8')
+                    request_data = MultipartBody(head, content, tail)
                     request_headers = {"Content-Type": "multipart/form-data; boundary={}".format(boundary),
-                                     "Content-Length": str(len(request_data))}
+                                       "Content-Length": str(len(request_data))}
                     return request_data, request_headers
                 else:
                     file_lines.append(str(content))
@@ -528,6 +1444,193 @@ class AGOLHandler(object):
                            "Content-Length": str(len(request_data))}
         return request_data, request_headers
 
+class SDDraftPatcher(object):
+    """
+    Applies a declarative set of edits to a .sddraft file in a single
+    streaming pass.
+    
+    The draft is read with a SAX parser and written straight back out, with
+    element names, attributes and namespace declarations passed through
+    unchanged, so no element tree of the whole draft is ever built. Edits:
+    
+    - typeNames: replacement text for Configurations/SVCConfiguration/TypeName
+    - configurationProperties: Key -> Value of the service ConfigurationProperties
+    - infoProperties: Key -> Value of the service Info properties
+    - properties: Key -> Value of any PropertySetProperty in the draft
+    - namespaces: attributes set on the SVCManifest root element
+    
+    When a cache directory is given, the patched draft is kept there keyed by
+    the hash of the source draft and the edits, so patching the draft of an
+    unchanged map again is a file copy.
+    """
+
+    SERVICE_PATH = ("SVCManifest", "Configurations", "SVCConfiguration")
+    CONFIGURATION_PATH = SERVICE_PATH + ("Definition", "ConfigurationProperties", "PropertyArray", "PropertySetProperty")
+    INFO_PATH = SERVICE_PATH + ("Definition", "Info", "PropertyArray", "PropertySetProperty")
+
+    def __init__(self, typeNames=None, configurationProperties=None, infoProperties=None,
+                 properties=None, namespaces=None, cacheDir=None):
+        self.typeNames = typeNames or {}
+        self.configurationProperties = configurationProperties or {}
+        self.infoProperties = infoProperties or {}
+        self.properties = properties or {}
+        self.namespaces = namespaces or {}
+        self.cacheDir = cacheDir
+
+    def patch(self, sourceDraft, outputDraft, name=None):
+        """
+        Write the patched copy of a .sddraft file.
+        
+        Args:
+            sourceDraft (str): Path to the .sddraft created from the map
+            outputDraft (str): Path to write the patched .sddraft to
+            name (str, optional): Name of the map or service, used to keep one
+                                  cached draft per map
+            
+        Raises:
+            ValueError: If the input is not a valid .sddraft file
+        """
+        if self.cacheDir is None:
+            self._patch(sourceDraft, outputDraft)
+            return
+
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+        sha = hashlib.sha256(json.dumps(self._edits(), sort_keys=True).encode('utf-8'))
+        sha.update(myfingerprint.fileHash(sourceDraft).encode('utf-8'))
+        name = name or "draft"
+        cachedDraft = os.path.join(self.cacheDir, "{}_{}.sddraft".format(name, sha.hexdigest()[:32]))
+
+        if not os.path.exists(cachedDraft):
+            self._patch(sourceDraft, cachedDraft + ".tmp")
+            os.replace(cachedDraft + ".tmp", cachedDraft)
+
+            # Keep only the latest patched draft of each map. The exact name
+            # pattern keeps the drafts of a map called e.g. "<name>_2"
+            pattern = re.compile(re.escape(name) + r"_[0-9a-f]{32}\.sddraft")
+            for fileName in os.listdir(self.cacheDir):
+                oldDraft = os.path.join(self.cacheDir, fileName)
+                if pattern.fullmatch(fileName) and oldDraft != cachedDraft:
+                    os.remove(oldDraft)
+
+        shutil.copyfile(cachedDraft, outputDraft)
+
+    def _edits(self):
+        return {'typeNames': self.typeNames,
+                'configurationProperties': self.configurationProperties,
+                'infoProperties': self.infoProperties,
+                'properties': self.properties,
+                'namespaces': self.namespaces}
+
+    def _patch(self, sourceDraft, outputDraft):
+        with open(outputDraft, 'wb') as out:
+            handler = _SDDraftHandler(out, self)
+            try:
+                xml.sax.parse(sourceDraft, handler)
+            except xml.sax.SAXParseException as e:
+                raise ValueError("Could not parse {}: {}".format(sourceDraft, e))
+
+
+class _SDDraftHandler(xml.sax.handler.ContentHandler):
+    """
+    SAX handler that copies a .sddraft to an XMLGenerator, applying the
+    edits of an SDDraftPatcher on the way.
+    """
+
+    def __init__(self, out, patcher):
+        xml.sax.handler.ContentHandler.__init__(self)
+        self.out = XMLGenerator(out, 'utf-8', short_empty_elements=True)
+        self.patcher = patcher
+        self.path = []
+        self.key = None
+        self.keyText = None
+        self.replacement = None
+        self.replacementDepth = None
+        self.typeNameText = None
+
+    def startDocument(self):
+        self.out.startDocument()
+
+    def endDocument(self):
+        self.out.endDocument()
+
+    def processingInstruction(self, target, data):
+        self.out.processingInstruction(target, data)
+
+    def startElement(self, name, attrs):
+        if not self.path:
+            if name != "SVCManifest":
+                raise ValueError("Root tag is incorrect. Is this a .sddraft file?")
+            attrs = dict(attrs.items())
+            attrs.update(self.patcher.namespaces)
+        self.path.append(name)
+        path = tuple(self.path)
+
+        if self.replacementDepth is not None:
+            # Everything inside a replaced Value, nested property sets included, is dropped
+            return
+
+        if name == "PropertySetProperty":
+            self.key = None
+        elif name == "Key" and path[-2] == "PropertySetProperty":
+            self.keyText = []
+        elif name == "Value" and path[-2] == "PropertySetProperty":
+            self.replacement = self._replacement(path[:-1])
+            if self.replacement is not None:
+                self.replacementDepth = len(path)
+                if not attrs.get('xsi:type', 'xs:').startswith('xs:'):
+                    # A replaced structured value becomes a plain string
+                    attrs = dict(attrs.items(), **{'xsi:type': 'xs:string'})
+        elif path == SDDraftPatcher.SERVICE_PATH + ("TypeName",):
+            self.typeNameText = []
+
+        self.out.startElement(name, attrs)
+
+    def endElement(self, name):
+        if self.replacementDepth is not None:
+            if len(self.path) > self.replacementDepth:
+                self.path.pop()
+                return
+            self.out.characters(self.replacement)
+            self.replacement = None
+            self.replacementDepth = None
+        elif self.keyText is not None and name == "Key":
+            self.key = "".join(self.keyText)
+            self.keyText = None
+        elif self.typeNameText is not None and name == "TypeName":
+            typeName = "".join(self.typeNameText)
+            self.out.characters(self.patcher.typeNames.get(typeName, typeName))
+            self.typeNameText = None
+
+        self.out.endElement(name)
+        self.path.pop()
+
+    def characters(self, content):
+        if self.replacementDepth is not None:
+            # Replaced values are written when the Value element ends
+            return
+        if self.keyText is not None:
+            self.keyText.append(content)
+        elif self.typeNameText is not None:
+            self.typeNameText.append(content)
+            return
+        self.out.characters(content)
+
+    def ignorableWhitespace(self, whitespace):
+        if self.replacementDepth is None:
+            self.out.ignorableWhitespace(whitespace)
+
+    def _replacement(self, propertyPath):
+        if propertyPath == SDDraftPatcher.CONFIGURATION_PATH and self.key in self.patcher.configurationProperties:
+            return str(self.patcher.configurationProperties[self.key])
+        if propertyPath == SDDraftPatcher.INFO_PATH and self.key in self.patcher.infoProperties:
+            return str(self.patcher.infoProperties[self.key])
+        if self.key in self.patcher.properties:
+            return str(self.patcher.properties[self.key])
+        return None
+
+
 def makeSD(MXD, serviceName, tempDir, outputSD, config=None):
     """
     Create a Service Definition (.SD) file from an ArcMap document (MXD).
@@ -561,57 +1664,37 @@ def makeSD(MXD, serviceName, tempDir, outputSD, config=None):
 
     arcpy.mapping.CreateMapSDDraft(MXD, SDdraft, serviceName, "MY_HOSTED_SERVICES")
 
-    # Read the contents of the original SDDraft into an xml parser
-    doc = ET.parse(SDdraft)
-
-    root_elem = doc.getroot()
-    if root_elem.tag != "SVCManifest":
-        raise ValueError("Root tag is incorrect. Is {} a .sddraft file?".format(SDdraft))
-
-    # The following sections modify the SDDraft from a new MapService
+    # The following edits modify the SDDraft from a new MapService
     # with caching capabilities to a FeatureService with Query, Create,
     # Update, Delete, Uploads, and Editing capabilities.
     # 
-    # The first two lines (commented out) are no longer necessary as the FS
-    # is now being deleted and re-published, not truly overwritten as is the
-    # case when publishing from Desktop.
+    # Replacing Type/State is no longer necessary as the FS is now being
+    # deleted and re-published, not truly overwritten as is the case when
+    # publishing from Desktop.
     # 
     # The modifications change Map to Feature Service, disable caching
     # and set appropriate capabilities. You can customize the capabilities by
-    # removing items from the WebCapabilities list.
+    # removing items from the WebCapabilities list, and override any other
+    # property with the 'sdDraftOverrides' config setting.
     # Note: You cannot disable Query capability from a Feature Service.
-
-    # These lines would be used for true overwrite scenarios:
-    # doc.find("./Type").text = "esriServiceDefinitionType_Replacement"
-    # doc.find("./State").text = "esriSDState_Published"
-
-    # Step 1: Change service type from MapServer to FeatureServer
-    # This converts the service from a map display service to a data editing service
-    for config in doc.findall("./Configurations/SVCConfiguration/TypeName"):
-        if config.text == "MapServer":
-            config.text = "FeatureServer"
-
-    # Step 2: Disable caching for the service
-    # Feature services should not use caching as data can be edited
-    for prop in doc.findall("./Configurations/SVCConfiguration/Definition/" +
-                            "ConfigurationProperties/PropertyArray/" +
-                            "PropertySetProperty"):
-        if prop.find("Key").text == 'isCached':
-            prop.find("Value").text = "false"
-
-    # Step 3: Enable feature service capabilities
-    # This allows users to query, create, update, delete, and upload data
-    for prop in doc.findall("./Configurations/SVCConfiguration/Definition/Info/PropertyArray/PropertySetProperty"):
-        if prop.find("Key").text == 'WebCapabilities':
-            prop.find("Value").text = "Query,Create,Update,Delete,Uploads,Editing"
-
-    # Step 4: Restore required XML namespaces that get stripped during parsing
-    root_elem.attrib["xmlns:typens"] = config.get('arcgisSchemaUrl', 'http://www.esri.com/schemas/ArcGIS/10.1')
-    root_elem.attrib["xmlns:xs"] = config.get('XMLSchemaUrl', 'http://www.w3.org/2001/XMLSchema')
-
-    # Write the new draft to disk
-    with open(newSDdraft, 'w') as f:
-        doc.write(f, 'utf-8')
+    patcher = SDDraftPatcher(
+        # Step 1: Change service type from MapServer to FeatureServer
+        # This converts the service from a map display service to a data editing service
+        typeNames={"MapServer": "FeatureServer"},
+        # Step 2: Disable caching for the service
+        # Feature services should not use caching as data can be edited
+        configurationProperties={'isCached': "false"},
+        # Step 3: Enable feature service capabilities
+        # This allows users to query, create, update, delete, and upload data
+        infoProperties={'WebCapabilities': "Query,Create,Update,Delete,Uploads,Editing"},
+        # Step 4: Make sure the required XML namespaces are declared
+        namespaces={"xmlns:typens": config.get('arcgisSchemaUrl', 'http://www.esri.com/schemas/ArcGIS/10.1'),
+                    "xmlns:xs": config.get('XMLSchemaUrl', 'http://www.w3.org/2001/XMLSchema')},
+        properties=config.get('sdDraftOverrides'),
+        cacheDir=os.path.join(tempDir, "sddraftcache"))
+
+    # Write the new draft to disk, reusing the patched draft of an identical map
+    patcher.patch(SDdraft, newSDdraft, serviceName)
 
     # Analyze the service
     analysis = arcpy.mapping.AnalyzeForSD(newSDdraft)
@@ -626,6 +1709,86 @@ def makeSD(MXD, serviceName, tempDir, outputSD, config=None):
         print("Errors in analyze: \n {}".format(analysis['errors']))
         sys.exit()
 
+def publishService(serviceName, MXD, folderName, tempDir, config, pool=None, stagingExecutor=None):
+    """
+    Run the stage, upload and publish pipeline of one hosted feature service.
+    
+    Args:
+        serviceName (str): Name of the service to update
+        MXD (str): Path to the ArcMap document containing the data
+        folderName (str): Name of the folder containing the service (use "None" for root)
+        tempDir (str): Directory for the staged .SD and temporary drafts
+        config (dict): Configuration dictionary
+        pool (ConnectionPool, optional): Connection pool shared with other services
+        stagingExecutor (concurrent.futures.Executor, optional): Executor to run makeSD on.
+                                                                 If None, makeSD runs in this thread
+        
+    When the 'skipUnchanged' config setting is on, the map document, the
+    data behind it and the draft settings are fingerprinted first and the
+    service is skipped entirely if the fingerprint matches the one recorded
+    at its last successful publish. The fingerprint is also taken when
+    'resumeUploads' is on, and an interrupted upload is only resumed if its
+    .SD was staged from data with the same fingerprint.
+        
+    Returns:
+        AGOLHandler: Handler used for the service, or None if it was skipped
+        str: Service item ID of the published feature service
+    """
+    if not os.path.isdir(tempDir):
+        os.makedirs(tempDir)
+    finalSD = os.path.join(tempDir, serviceName + ".sd")
+
+    skipUnchanged = config.get('skipUnchanged', False)
+    resumeUploads = config.get('resumeUploads', False)
+
+    fingerprint = None
+    if skipUnchanged or resumeUploads:
+        # Everything makeSD builds the draft from besides the map itself
+        draftSettings = {'serviceName': serviceName,
+                         'arcgisSchemaUrl': config.get('arcgisSchemaUrl'),
+                         'XMLSchemaUrl': config.get('XMLSchemaUrl'),
+                         'sdDraftOverrides': config.get('sdDraftOverrides')}
+        if stagingExecutor is None:
+            fingerprint = myfingerprint.mxdFingerprint(MXD, draftSettings)
+        else:
+            fingerprint = stagingExecutor.submit(myfingerprint.mxdFingerprint, MXD, draftSettings).result()
+
+    if skipUnchanged:
+        fingerprints = myfingerprint.FingerprintCache()
+        if fingerprints.isUnchanged(serviceName, fingerprint):
+            print("{} data unchanged since last publish, skipping".format(serviceName))
+            return None, None
+
+    # initialize AGOLHandler class with config
+    agol = AGOLHandler(config.get('username', 'SammamishPlateauWater'),
+                       config.get('password', 'W@ter@nd$ewer4u'),
+                       serviceName, folderName, config, pool)
+
+    # Turn map document into .SD file for uploading, unless an interrupted
+    # upload of an .SD staged from the same data can be resumed
+    if resumeUploads and fingerprint is not None and agol.load_journal(finalSD, fingerprint):
+        print("Resuming upload of {}".format(finalSD))
+    else:
+        # The journal belongs to an .SD that is about to be replaced
+        agol.discard_journal(finalSD)
+        if stagingExecutor is None:
+            makeSD(MXD, serviceName, tempDir, finalSD, config)
+        else:
+            stagingExecutor.submit(makeSD, MXD, serviceName, tempDir, finalSD, config).result()
+
+    # overwrite the existing .SD on arcgis.com and publish it. The journal
+    # records the fingerprint, so a resumed .SD is always the one the
+    # fingerprint recorded below describes
+    fsID = None
+    if agol.upload(finalSD, fingerprint=fingerprint):
+        fsID = agol.publish()
+
+    if fsID and skipUnchanged:
+        fingerprints.record(serviceName, fingerprint, finalSD)
+
+    return agol, fsID
+
+
 def updateContent(serviceName, MXD, config=None):
     """
     Update an ArcGIS Online hosted feature service with new data.
@@ -647,38 +1810,104 @@ def updateContent(serviceName, MXD, config=None):
     if config is None:
         config = loadConfig()
 
-    # AGOL Credentials from config
-    inputUsername = config.get('username', 'SammamishPlateauWater')
-    inputPswd = config.get('password', 'W@ter@nd$ewer4u')
-
-    # FS values
-    MXD = MXD
-    serviceName = serviceName
-    folderName = "None"
-
     # create a temp directory under the script
-    tempDir = r"C:\Temp\tempDir"
-    if not os.path.isdir(tempDir):
-        os.mkdir(tempDir)
-    finalSD = os.path.join(tempDir, serviceName + ".sd")
+    tempDir = config.get('tempDir', r"C:\Temp\tempDir")
 
-    # initialize AGOLHandler class with config
-    agol = AGOLHandler(inputUsername, inputPswd, serviceName, folderName, config)
+    agol, fsID = publishService(serviceName, MXD, "None", tempDir, config)
 
-    # Turn map document into .SD file for uploading
-    makeSD(MXD, serviceName, tempDir, finalSD, config)
+    if agol is not None:
+        stats = agol.pool.stats()
+        print("connections: {} new, {} reused".format(stats['created'], stats['reused']))
 
-    # overwrite the existing .SD on arcgis.com
-    if agol.upload(finalSD):
+    print("\nfinished.")
 
-        # publish the sd which was just uploaded
-        fsID = agol.publish()
 
-        print("\nfinished.")
+def updateContents(manifest, config=None, workers=None):
+    """
+    Update several ArcGIS Online hosted feature services concurrently.
+    
+    Each service runs the same pipeline as updateContent. Up to 'workers'
+    services upload and publish at once on a thread pool, sharing one
+    connection pool, while the arcpy staging of their .SD files runs on a
+    process pool of 'stagingWorkers' processes. Each service is staged in
+    its own sub-directory of 'tempDir' so the drafts do not collide.
+    
+    Args:
+        manifest (list or str): List of {"serviceName", "MXD", "folderName"} dicts
+                                ("folderName" is optional), or the path to a
+                                JSON file containing that list
+        config (dict, optional): Configuration dictionary. If None, will load from config.json
+        workers (int, optional): Number of services processed at once.
+                                 If None, uses the 'publishWorkers' config setting
         
+    Returns:
+        list: Per-service result dicts with 'serviceName', 'status'
+              (published | skipped | failed), 'serviceItemId', 'error' and 'elapsed'
+    """
+    if config is None:
+        config = loadConfig()
+
+    if isinstance(manifest, str):
+        with open(manifest, 'r') as manifestFile:
+            manifest = json.load(manifestFile)
+
+    if workers is None:
+        workers = int(config.get('publishWorkers', 4))
+    stagingWorkers = int(config.get('stagingWorkers', 2))
+    tempDir = config.get('tempDir', r"C:\Temp\tempDir")
+
+    pool = ConnectionPool(config.get('poolMaxSize', 8), config.get('poolIdleTimeout', 60))
+
+    print("Starting Feature Service publish process for {} services".format(len(manifest)))
+
+    def run(entry):
+        serviceName = entry['serviceName']
+        start = time.time()
+        result = {'serviceName': serviceName, 'status': 'failed', 'serviceItemId': None, 'error': None}
+        try:
+            agol, fsID = publishService(serviceName, entry['MXD'], entry.get('folderName', "None"),
+                                        os.path.join(tempDir, serviceName), config, pool,
+                                        stagingExecutor)
+            if agol is None:
+                result['status'] = 'skipped'
+            elif fsID:
+                result['status'] = 'published'
+                result['serviceItemId'] = fsID
+        except (Exception, SystemExit) as e:
+            # AGOLHandler exits on errors; keep the other services running
+            result['error'] = str(e) or type(e).__name__
+        result['elapsed'] = time.time() - start
+        print("{}: {} in {:.1f}s".format(serviceName, result['status'], result['elapsed']))
+        return result
+
+    with ProcessPoolExecutor(max_workers=stagingWorkers) as stagingExecutor:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, manifest))
+
+    pool.close()
+
+    print("\nSummary")
+    for result in results:
+        line = "  {:<40} {:<10} {:>8.1f}s".format(result['serviceName'], result['status'], result['elapsed'])
+        if result['error']:
+            line += "  {}".format(result['error'])
+        print(line)
+    published = sum(1 for result in results if result['status'] == 'published')
+    skipped = sum(1 for result in results if result['status'] == 'skipped')
+    print("Published: {}  Skipped: {}  Failed: {}".format(published, skipped,
+                                                          len(results) - published - skipped))
+
+    stats = pool.stats()
+    print("connections: {} new, {} reused".format(stats['created'], stats['reused']))
+
+    return results
+
 if __name__ == "__main__":
-    # Example usage - you'll need to provide actual serviceName and MXD values
+    # Usage: python myarcgisonline.py <manifest.json>
+    # where the manifest is a list of {"serviceName": ..., "MXD": ..., "folderName": ...}
+    # Single service example:
     # serviceName = "YourServiceName"
     # MXD = r"C:\path\to\your\map.mxd"
     # updateContent(serviceName, MXD)
-    pass
+    if len(sys.argv) == 2:
+        updateContents(sys.argv[1])
@@ -0,0 +1,479 @@
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import myarcgisonline
+
+
+class _PortalHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the ArcGIS Online sharing API for one SD item upload.
+
+    Behavior is driven by the state dict of the server: 'failParts' holds
+    part numbers whose next addPart fails with a server error, 'dropParts'
+    those whose next addPart response is cut short,
+    'rejectCommits' is the number of commits to refuse with an item error
+    and 'rejectTokens' holds tokens that /data answers with a 498 error.
+    When 'searchItems' is set, /search pages through it by start and num,
+    answering the second page last.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle(b'')
+
+    def do_POST(self):
+        self._handle(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+    def _reply(self, response):
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_truncated(self, response):
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2])
+        self.close_connection = True
+
+    def _handle(self, body):
+        state = self.server.state
+        url = urlparse(self.path)
+        path = url.path
+
+        if path.endswith('/search') and state['searchItems'] is not None:
+            params = parse_qs(body.decode('utf-8'))
+            start, num = int(params['start'][0]), int(params['num'][0])
+            if start == num + 1:
+                time.sleep(0.2)
+            with self.server.lock:
+                state['searchStarts'].append(start)
+            items = state['searchItems']
+            nextStart = start + num if start + num <= len(items) else -1
+            return self._reply({'total': len(items), 'start': start, 'num': num, 'nextStart': nextStart,
+                                'results': items[start - 1:start - 1 + num]})
+
+        with self.server.lock:
+            if path.endswith('/generateToken'):
+                self.server.tokenCount += 1
+                return self._reply({'token': 'token{}'.format(self.server.tokenCount), 'expires': 9999999999999})
+            if path.endswith('/data'):
+                token = parse_qs(url.query)['token'][0]
+                if token in state['rejectTokens']:
+                    return self._reply({'error': {'code': 498, 'message': 'Invalid token.'}})
+                return self._reply({'token': token})
+            if path.endswith('/search'):
+                return self._reply({'total': 2, 'results': [
+                    {'title': 'svc', 'type': 'Feature Service', 'id': 'fs1'},
+                    {'title': 'svc', 'type': 'Service Definition', 'id': 'sd1'}]})
+            if path.endswith('/update'):
+                state['updates'] += 1
+                state['parts'] = {}
+                return self._reply({'success': True, 'id': 'sd1'})
+            if path.endswith('/addPart'):
+                partNum = int(re.search(rb'name="partNum"\r\n\r\n(\d+)', body).group(1))
+                state['partRequests'].append(partNum)
+                if partNum in state['failParts']:
+                    state['failParts'].discard(partNum)
+                    return self._reply({'error': {'code': 500, 'message': 'Internal error'}})
+                if partNum in state['dropParts']:
+                    state['dropParts'].discard(partNum)
+                    return self._reply_truncated({'success': True, 'id': 'sd1'})
+                content = body.split(b'filename=', 1)[1].split(b'\r\n\r\n', 1)[1]
+                state['parts'][partNum] = content[:content.rindex(b'\r\n--')]
+                return self._reply({'success': True, 'id': 'sd1'})
+            if path.endswith('/commit'):
+                if state['rejectCommits']:
+                    state['rejectCommits'] -= 1
+                    return self._reply({'error': {'code': 400, 'message': 'Item is not in a state to commit'}})
+                state['committed'] = b''.join(state['parts'][num] for num in sorted(state['parts']))
+                return self._reply({'success': True, 'id': 'sd1'})
+            if path.endswith('/status'):
+                return self._reply({'status': 'completed'})
+            return self._reply({'error': {'code': 404, 'message': 'Not found'}})
+
+
+class PortalTestCase(unittest.TestCase):
+    """
+    Runs an AGOLHandler against a local _PortalHandler server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _PortalHandler)
+        cls.server.lock = threading.Lock()
+        cls.server.tokenCount = 0
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.state = {'updates': 0, 'parts': {}, 'partRequests': [], 'failParts': set(), 'dropParts': set(),
+                             'rejectCommits': 0, 'rejectTokens': set(), 'committed': None,
+                             'searchItems': None, 'searchStarts': []}
+        self.tempDir = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.tempDir, "svc.sd")
+        self.data = os.urandom(10500)
+        with open(self.fileName, 'wb') as f:
+            f.write(self.data)
+
+        config = {'baseUrl': "http://127.0.0.1:{}".format(self.server.server_port),
+                  'partSize': 1000,
+                  'uploadWorkers': 4,
+                  'partRetries': 0,
+                  'pollInitialDelay': 0.01,
+                  'discoveryCachePath': None}
+        self.agol = myarcgisonline.AGOLHandler('user', 'password', 'svc', 'None', config)
+
+    def tearDown(self):
+        self.agol.pool.close()
+        shutil.rmtree(self.tempDir)
+
+
+class UploadTest(PortalTestCase):
+
+    def test_upload_commits_parts_in_order(self):
+        self.assertTrue(self.agol.upload(self.fileName, resume=False))
+        self.assertEqual(self.server.state['committed'], self.data)
+        self.assertEqual(sorted(self.server.state['partRequests']), list(range(1, 12)))
+
+    def test_failed_part_is_retried(self):
+        self.agol.config['partRetries'] = 1
+        self.server.state['failParts'] = {3}
+
+        self.assertTrue(self.agol.upload(self.fileName, resume=False))
+        self.assertEqual(self.server.state['partRequests'].count(3), 2)
+        self.assertEqual(self.server.state['committed'], self.data)
+
+    def test_dropped_response_is_retried(self):
+        self.agol.config['partRetries'] = 1
+        self.server.state['dropParts'] = {2, 5}
+
+        self.assertTrue(self.agol.upload(self.fileName, resume=False))
+        self.assertEqual(self.server.state['partRequests'].count(2), 2)
+        self.assertEqual(self.server.state['partRequests'].count(5), 2)
+        self.assertEqual(self.server.state['committed'], self.data)
+
+    def test_resume_uploads_only_missing_parts(self):
+        self.server.state['failParts'] = {3, 7}
+        with self.assertRaises(SystemExit):
+            self.agol.upload(self.fileName, resume=True)
+
+        journal = self.agol.load_journal(self.fileName)
+        self.assertEqual(sorted(journal['parts']), [1, 2, 4, 5, 6, 8, 9, 10, 11])
+
+        self.server.state['partRequests'] = []
+        self.assertTrue(self.agol.upload(self.fileName, resume=True))
+        self.assertEqual(sorted(self.server.state['partRequests']), [3, 7])
+        self.assertEqual(self.server.state['updates'], 1)
+        self.assertEqual(self.server.state['committed'], self.data)
+        self.assertFalse(os.path.exists(self.fileName + '.upload.json'))
+
+    def test_resume_needs_matching_fingerprint(self):
+        self.server.state['failParts'] = {3}
+        with self.assertRaises(SystemExit):
+            self.agol.upload(self.fileName, resume=True, fingerprint="a")
+
+        self.assertIsNotNone(self.agol.load_journal(self.fileName, "a"))
+        self.assertIsNone(self.agol.load_journal(self.fileName, "b"))
+
+    def test_rejected_resume_starts_over(self):
+        self.server.state['failParts'] = {3}
+        with self.assertRaises(SystemExit):
+            self.agol.upload(self.fileName, resume=True)
+
+        self.server.state['rejectCommits'] = 1
+        self.assertTrue(self.agol.upload(self.fileName, resume=True))
+        self.assertEqual(self.server.state['updates'], 2)
+        self.assertEqual(self.server.state['committed'], self.data)
+        self.assertFalse(os.path.exists(self.fileName + '.upload.json'))
+
+    def test_rejected_token_is_replaced_once(self):
+        url = "http://127.0.0.1:{}/data".format(self.server.server_port)
+        token = self.agol.token
+        self.server.state['rejectTokens'] = {token}
+
+        response = self.agol.url_request(url, {'token': token, 'f': 'json'})
+        self.assertNotEqual(response['token'], token)
+        self.assertEqual(self.agol.token, response['token'])
+
+    def test_requests_share_a_connection(self):
+        url = "http://127.0.0.1:{}/data".format(self.server.server_port)
+        before = self.agol.pool.stats()
+        for _ in range(3):
+            self.agol.url_request(url, {'token': self.agol.token, 'f': 'json'})
+
+        after = self.agol.pool.stats()
+        self.assertEqual(after['created'], before['created'])
+        self.assertEqual(after['reused'] - before['reused'], 3)
+
+
+class SearchTest(PortalTestCase):
+
+    def test_every_page_in_order(self):
+        items = [{'id': "item{}".format(i)} for i in range(1, 48)]
+        self.server.state['searchItems'] = items
+
+        found = list(self.agol.search("owner:user", num=10, prefetch=3))
+        self.assertEqual(found, items)
+        self.assertEqual(sorted(self.server.state['searchStarts']), [1, 11, 21, 31, 41])
+
+    def test_single_page(self):
+        self.server.state['searchItems'] = [{'id': "item1"}, {'id': "item2"}]
+        self.assertEqual(list(self.agol.search("owner:user", num=10)), self.server.state['searchItems'])
+        self.assertEqual(self.server.state['searchStarts'], [1])
+
+    def test_break_stops_paging(self):
+        self.server.state['searchItems'] = [{'id': "item{}".format(i)} for i in range(1, 101)]
+
+        for count, item in enumerate(self.agol.search("owner:user", num=10, prefetch=2), 1):
+            if count == 5:
+                break
+        time.sleep(0.3)
+        self.assertLessEqual(len(self.server.state['searchStarts']), 3)
+
+
+class _Connection(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def pool(self, **kwargs):
+        pool = myarcgisonline.ConnectionPool(**kwargs)
+        pool._connect = lambda scheme, host, port: _Connection()
+        return pool
+
+    def test_idle_connection_is_reused_per_host(self):
+        pool = self.pool()
+        conn, reused = pool.acquire('https', 'a.com', 443)
+        self.assertFalse(reused)
+        pool.release('https', 'a.com', 443, conn)
+
+        self.assertEqual(pool.acquire('https', 'a.com', 443), (conn, True))
+        self.assertIsNot(pool.acquire('https', 'b.com', 443)[0], conn)
+        self.assertIsNot(pool.acquire('http', 'a.com', 443)[0], conn)
+        self.assertEqual(pool.stats(), {'created': 3, 'reused': 1})
+
+    def test_fresh_skips_idle_connections(self):
+        pool = self.pool()
+        conn = pool.acquire('https', 'a.com', 443)[0]
+        pool.release('https', 'a.com', 443, conn)
+
+        fresh, reused = pool.acquire('https', 'a.com', 443, fresh=True)
+        self.assertIsNot(fresh, conn)
+        self.assertFalse(reused)
+
+    def test_idle_timeout_evicts(self):
+        pool = self.pool(idle_timeout=0.05)
+        conn = pool.acquire('https', 'a.com', 443)[0]
+        pool.release('https', 'a.com', 443, conn)
+        time.sleep(0.1)
+
+        newConn, reused = pool.acquire('https', 'a.com', 443)
+        self.assertFalse(reused)
+        self.assertIsNot(newConn, conn)
+        self.assertTrue(conn.closed)
+
+    def test_maxsize_closes_surplus(self):
+        pool = self.pool(maxsize=2)
+        conns = [pool.acquire('https', 'a.com', 443)[0] for _ in range(3)]
+        for conn in conns:
+            pool.release('https', 'a.com', 443, conn)
+
+        self.assertEqual([conn.closed for conn in conns], [False, False, True])
+        pool.close()
+        self.assertTrue(all(conn.closed for conn in conns))
+        self.assertFalse(pool.acquire('https', 'a.com', 443)[1])
+
+
+class WaitForJobTest(unittest.TestCase):
+
+    def handler(self, statuses, **config):
+        agol = myarcgisonline.AGOLHandler.__new__(myarcgisonline.AGOLHandler)
+        agol.config = config
+        statuses = iter(statuses)
+        agol.item_status = lambda item_id, jobId=None: {'status': next(statuses)}
+        return agol
+
+    def test_backoff_up_to_cap(self):
+        agol = self.handler(['partial'] + ['processing'] * 5 + ['completed'],
+                            pollInitialDelay=1, pollMaxDelay=4, pollBackoff=2)
+        with unittest.mock.patch('time.sleep') as sleep:
+            result = agol.wait_for_job("item")
+
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['polls'], 7)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        for delay, expected in zip(delays, [1, 2, 4, 4, 4, 4]):
+            self.assertTrue(expected * 0.8 <= delay <= expected * 1.2, (delay, expected))
+        self.assertEqual(len(delays), 6)
+
+    def test_failed_and_missing_status(self):
+        self.assertEqual(self.handler(['failed']).wait_for_job("item")['status'], 'failed')
+
+        agol = self.handler([])
+        agol.item_status = lambda item_id, jobId=None: {'error': {'code': 500}}
+        result = agol.wait_for_job("item")
+        self.assertEqual((result['status'], result['polls']), ('failed', 1))
+
+    def test_timeout(self):
+        agol = self.handler(iter(lambda: 'processing', None), pollInitialDelay=0.02, pollMaxDelay=0.05)
+        result = agol.wait_for_job("item", timeout=0.2)
+
+        self.assertEqual(result['status'], 'timeout')
+        self.assertGreaterEqual(result['elapsed'], 0.2)
+        self.assertLess(result['elapsed'], 1)
+        self.assertGreater(result['polls'], 3)
+
+
+class JSONArrayStreamTest(unittest.TestCase):
+
+    def stream(self, text, key='results', **kwargs):
+        return myarcgisonline.JSONArrayStream(io.StringIO(text), key, **kwargs)
+
+    def test_elements_and_meta(self):
+        response = {'total': 3, 'results': [{'id': 1}, {'id': 22222}, [1, 2]], 'nextStart': -1}
+        stream = self.stream(json.dumps(response), chunk_size=3)
+
+        self.assertEqual(list(stream), response['results'])
+        self.assertEqual(stream.meta, {'total': 3, 'nextStart': -1})
+
+    def test_numbers_split_across_reads(self):
+        stream = self.stream('{"results": [1234567, 89, 1.5e10]}', chunk_size=2)
+        self.assertEqual(list(stream), [1234567, 89, 1.5e10])
+
+    def test_empty_and_missing_array(self):
+        self.assertEqual(list(self.stream('{"results": []}')), [])
+
+        stream = self.stream('{"error": {"code": 400, "details": [1, 2]}}')
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.meta, {'error': {'code': 400, 'details': [1, 2]}})
+
+    def test_on_close_called_once(self):
+        closed = []
+        stream = self.stream('{"results": [1, 2, 3]}', on_close=lambda: closed.append(True))
+        for value in stream:
+            break
+        stream.close()
+        stream.close()
+        self.assertEqual(closed, [True])
+
+    def test_truncated_response(self):
+        with self.assertRaises(ValueError):
+            list(self.stream('{"results": [1, 2', chunk_size=4))
+
+
+class SDDraftPatcherTest(unittest.TestCase):
+
+    DRAFT = ('<?xml version="1.0" encoding="utf-8"?>'
+             '<SVCManifest xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+             '<Configurations><SVCConfiguration>'
+             '<TypeName>MapServer</TypeName>'
+             '<Definition>'
+             '<ConfigurationProperties><PropertyArray>'
+             '<PropertySetProperty><Key>isCached</Key><Value>true</Value></PropertySetProperty>'
+             '<PropertySetProperty><Key>nested</Key><Value xsi:type="typens:PropertySet"><PropertyArray>'
+             '<PropertySetProperty><Key>isCached</Key><Value>true</Value></PropertySetProperty>'
+             '</PropertyArray></Value></PropertySetProperty>'
+             '<PropertySetProperty><Key>maxRecordCount</Key><Value>1000</Value></PropertySetProperty>'
+             '</PropertyArray></ConfigurationProperties>'
+             '<Info><PropertyArray>'
+             '<PropertySetProperty><Key>WebCapabilities</Key><Value>Map</Value></PropertySetProperty>'
+             '</PropertyArray></Info>'
+             '</Definition>'
+             '</SVCConfiguration></Configurations>'
+             '</SVCManifest>')
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.draft = os.path.join(self.tempDir, "map.sddraft")
+        self.output = os.path.join(self.tempDir, "patched.sddraft")
+        with open(self.draft, 'w') as f:
+            f.write(self.DRAFT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def values(self, path):
+        root = ET.parse(path).getroot()
+        return {prop.findtext('Key'): prop.find('Value')
+                for prop in root.iter('PropertySetProperty')}
+
+    def test_patch(self):
+        patcher = myarcgisonline.SDDraftPatcher(typeNames={"MapServer": "FeatureServer"},
+                                                configurationProperties={'isCached': "false"},
+                                                infoProperties={'WebCapabilities': "Query"},
+                                                properties={'maxRecordCount': 2000},
+                                                namespaces={'xmlns:typens': "urn:typens"})
+        patcher.patch(self.draft, self.output)
+
+        with open(self.output) as f:
+            self.assertIn('xmlns:typens="urn:typens"', f.read())
+        root = ET.parse(self.output).getroot()
+        self.assertEqual(root.find('Configurations/SVCConfiguration/TypeName').text, "FeatureServer")
+        configuration = root.find('Configurations/SVCConfiguration/Definition/ConfigurationProperties')
+        values = {prop.findtext('Key'): prop.findtext('Value')
+                  for prop in configuration.find('PropertyArray').findall('PropertySetProperty')}
+        self.assertEqual(values['isCached'], "false")
+        self.assertEqual(values['maxRecordCount'], "2000")
+        self.assertEqual(self.values(self.output)['WebCapabilities'].text, "Query")
+
+    def test_nested_value_is_replaced_whole(self):
+        patcher = myarcgisonline.SDDraftPatcher(properties={'nested': "flat"})
+        patcher.patch(self.draft, self.output)
+
+        nested = self.values(self.output)['nested']
+        self.assertEqual(nested.text, "flat")
+        self.assertEqual(len(nested), 0)
+        self.assertEqual(nested.get('{http://www.w3.org/2001/XMLSchema-instance}type'), "xs:string")
+
+    def test_not_a_draft(self):
+        with open(self.draft, 'w') as f:
+            f.write('<?xml version="1.0"?><Other/>')
+        with self.assertRaises(ValueError):
+            myarcgisonline.SDDraftPatcher().patch(self.draft, self.output)
+
+    def test_cache_keeps_one_draft_per_map(self):
+        cacheDir = os.path.join(self.tempDir, "cache")
+        myarcgisonline.SDDraftPatcher(cacheDir=cacheDir).patch(self.draft, self.output, "svc_2")
+        myarcgisonline.SDDraftPatcher(cacheDir=cacheDir).patch(self.draft, self.output, "svc")
+        myarcgisonline.SDDraftPatcher(properties={'maxRecordCount': 1}, cacheDir=cacheDir).patch(
+            self.draft, self.output, "svc")
+
+        cached = os.listdir(cacheDir)
+        self.assertEqual(len(cached), 2)
+        self.assertEqual(len([name for name in cached if name.startswith("svc_2_")]), 1)
+        self.assertEqual(self.values(self.output)['maxRecordCount'].text, "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
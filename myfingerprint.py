@@ -0,0 +1,244 @@
+import arcpy
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+
+def loadConfig() -> Dict[str, Any]:
+    """
+    Load configuration from config.json file.
+
+    Returns:
+        Dictionary containing myFingerprint configuration
+    """
+    try:
+        configPath = os.path.join(os.path.dirname(__file__), 'config.json')
+        with open(configPath, 'r') as configFile:
+            config = json.load(configFile)
+
+        if 'myFingerprint' not in config:
+            # Return empty dict if section doesn't exist
+            return {}
+
+        return config['myFingerprint']
+
+    except FileNotFoundError:
+        print(f"Warning: Config file not found: {configPath}")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Warning: Invalid JSON in config file: {str(e)}")
+        return {}
+
+
+def datasetFingerprint(dataSource: str, whereClause: Optional[str] = None) -> str:
+    """
+    Fingerprint the rows of a table or feature class.
+
+    Every attribute and the geometry (as WKB) of each row is hashed, and the
+    row hashes are combined with a sum so the result does not depend on the
+    order the cursor returns the rows in. Memory use is constant.
+
+    Args:
+        dataSource: Path to the table or feature class
+        whereClause: Definition query limiting the rows
+
+    Returns:
+        Hex fingerprint of the row count and content
+    """
+    fields = [field.name for field in arcpy.ListFields(dataSource)
+              if field.type not in ('Geometry', 'Blob', 'Raster')]
+    if hasattr(arcpy.Describe(dataSource), 'shapeType'):
+        fields.append('SHAPE@WKB')
+
+    count = 0
+    total = 0
+    with arcpy.da.SearchCursor(dataSource, fields, whereClause or None) as cursor:
+        for row in cursor:
+            count += 1
+            total += int.from_bytes(hashlib.sha256(repr(row).encode('utf-8')).digest(), 'big')
+
+    return hashlib.sha256(f"{count}|{total % (1 << 256)}".encode('utf-8')).hexdigest()
+
+
+def layersFingerprint(layers: List[Any]) -> str:
+    """
+    Fingerprint the data behind a list of map layers and tables.
+
+    Layers without a data source (group layers, basemaps) are ignored. A
+    layer whose data cannot be read gets a one-off fingerprint, so the map
+    is always treated as changed rather than wrongly skipped.
+
+    Args:
+        layers: arcpy.mapping or arcpy.mp layer and table objects
+
+    Returns:
+        Hex fingerprint of all layer data
+    """
+    sha = hashlib.sha256()
+    for layer in layers:
+        if hasattr(layer, 'supports') and not layer.supports("DATASOURCE"):
+            continue
+        dataSource = getattr(layer, 'dataSource', None)
+        if not dataSource:
+            continue
+        query = getattr(layer, 'definitionQuery', "") or ""
+
+        try:
+            fingerprint = datasetFingerprint(dataSource, query)
+        except Exception as e:
+            print(f"Warning: Could not fingerprint {dataSource}: {str(e)}")
+            fingerprint = f"unreadable {time.time()}"
+
+        sha.update(f"{layer.name}|{dataSource}|{query}|{fingerprint}\n".encode('utf-8'))
+    return sha.hexdigest()
+
+
+def documentFingerprint(dataFingerprint: str, documentPath: Optional[str] = None,
+                        settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Combine a data fingerprint with the map document and publish settings.
+
+    Symbology, labels, layer order and service properties live in the map
+    document and the draft settings rather than in the data, so a change
+    to either has to change the fingerprint too.
+
+    Args:
+        dataFingerprint: Fingerprint of the layer data
+        documentPath: Path to the .mxd or .aprx file
+        settings: Settings the service definition draft is built from. Must
+                  be JSON serializable
+
+    Returns:
+        Hex fingerprint of the data, document and settings
+    """
+    sha = hashlib.sha256(f"data|{dataFingerprint}\n".encode('utf-8'))
+    if documentPath:
+        sha.update(f"document|{fileHash(documentPath)}\n".encode('utf-8'))
+    if settings is not None:
+        sha.update(f"settings|{json.dumps(settings, sort_keys=True)}\n".encode('utf-8'))
+    return sha.hexdigest()
+
+
+def mxdFingerprint(MXD: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Fingerprint an ArcMap document, the data of its layers and tables, and
+    the settings it is published with.
+
+    Args:
+        MXD: Path to the ArcMap document (.mxd file)
+        settings: Settings the service definition draft is built from
+
+    Returns:
+        Hex fingerprint of the map
+    """
+    mxd = arcpy.mapping.MapDocument(MXD)
+    data = layersFingerprint(arcpy.mapping.ListLayers(mxd) + arcpy.mapping.ListTableViews(mxd))
+    return documentFingerprint(data, MXD, settings)
+
+
+def mapFingerprint(map, projectPath: Optional[str] = None,
+                   settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Fingerprint an ArcGIS Pro map, the data of its layers and tables, and
+    the settings it is published with.
+
+    Args:
+        map: arcpy.mp Map object
+        projectPath: Path to the .aprx file holding the map
+        settings: Settings the service definition draft is built from
+
+    Returns:
+        Hex fingerprint of the map
+    """
+    data = layersFingerprint(map.listLayers() + map.listTables())
+    return documentFingerprint(data, projectPath, settings)
+
+
+def fileHash(path: str) -> str:
+    """
+    SHA-256 of a file, read in 1MB blocks.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex digest of the file content
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+_cacheLock = threading.Lock()
+
+
+class FingerprintCache:
+    """
+    Fingerprints of the data behind each service at its last successful publish.
+
+    Attributes:
+        cachePath (str): Path of the JSON file holding the fingerprints
+    """
+
+    def __init__(self, cachePath: Optional[str] = None):
+        """
+        Initialize the fingerprint cache.
+
+        Args:
+            cachePath: Path of the JSON file. If None, uses the 'cachePath'
+                       setting of the myFingerprint config section
+        """
+        if cachePath is None:
+            cachePath = loadConfig().get('cachePath', os.path.join(os.path.dirname(__file__),
+                                                                   'fingerprints.json'))
+        self.cachePath = cachePath
+
+    def isUnchanged(self, serviceName: str, fingerprint: str) -> bool:
+        """
+        Check whether a service was last published from identical data.
+
+        Args:
+            serviceName: Name of the service
+            fingerprint: Fingerprint of the data about to be published
+
+        Returns:
+            True if the last successful publish had the same fingerprint
+        """
+        with _cacheLock:
+            record = self._load().get(serviceName)
+        return record is not None and record.get('fingerprint') == fingerprint
+
+    def record(self, serviceName: str, fingerprint: str, sdPath: Optional[str] = None) -> None:
+        """
+        Record the fingerprint of a successful publish.
+
+        Args:
+            serviceName: Name of the service
+            fingerprint: Fingerprint of the published data
+            sdPath: Path of the published .sd file, whose hash is stored alongside
+        """
+        record = {'fingerprint': fingerprint, 'time': time.time()}
+        if sdPath and os.path.exists(sdPath):
+            record['sdHash'] = fileHash(sdPath)
+
+        with _cacheLock:
+            records = self._load()
+            records[serviceName] = record
+            try:
+                with open(self.cachePath + '.tmp', 'w') as cacheFile:
+                    json.dump(records, cacheFile, indent=2)
+                os.replace(self.cachePath + '.tmp', self.cachePath)
+            except OSError as e:
+                print(f"Warning: Could not write fingerprint cache {self.cachePath}: {str(e)}")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.cachePath, 'r') as cacheFile:
+                return json.load(cacheFile)
+        except (OSError, ValueError):
+            return {}
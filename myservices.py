@@ -1,9 +1,18 @@
+import asyncio
 import urllib.parse
 import json
 import http.client
 import os
+import ssl
 import sys
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+import mytoken
+
+
+# State a service reaches after each operation
+SERVICE_STATES = {"START": "STARTED", "STOP": "STOPPED"}
 
 def loadConfig() -> Dict[str, Any]:
     """
@@ -32,13 +41,18 @@ def loadConfig() -> Dict[str, Any]:
     except Exception as e:
         raise RuntimeError(f"Failed to load configuration: {str(e)}")
 
-def startStopService(folderName: str, operation: str) -> bool:
+def startStopService(folderName: str, operation: str, onlyChanged: Optional[bool] = None) -> bool:
     """
     Start or stop all services in a specified folder on ArcGIS Server.
     
+    The operations are sent concurrently through an AdminClient, at most
+    'maxConcurrentOperations' (config) at a time.
+    
     Args:
         folderName: Name of the folder containing services
         operation: "START" or "STOP" operation to perform
+        onlyChanged: Skip services already in the target state. If None,
+                     uses the 'onlyChanged' config setting
         
     Returns:
         True if all operations were successful, False otherwise
@@ -49,12 +63,6 @@ def startStopService(folderName: str, operation: str) -> bool:
     try:
         # Load configuration from config.json
         config = loadConfig()
-        
-        # Get server credentials from config
-        username = config['username']
-        password = config['password']
-        serverName = config['serverName']
-        serverPort = config['serverPort']
 
         # Validate operation parameter
         if operation.upper() not in ["START", "STOP"]:
@@ -64,155 +72,835 @@ def startStopService(folderName: str, operation: str) -> bool:
         operation = operation.upper()
         
         print(f"Operation: {operation} services in folder '{folderName}'")
-        print(f"Server: {serverName}:{serverPort}\n")
+        print(f"Server: {config['serverName']}:{config['serverPort']}\n")
+
+        started = time.perf_counter()
+        results = startStopServices(folderName, operation, config, onlyChanged=onlyChanged)
+
+        if not results:
+            print(f"No services found in folder '{folderName}'")
+            return True
+
+        for result in results:
+            if result['skipped'] and result['success']:
+                print(f"Service {result['service']} already {result['state']}.")
+            elif result['success']:
+                print(f"Service {result['service']} {SERVICE_STATES[operation].lower()} successfully "
+                      f"({result['latency']:.2f}s).")
+            else:
+                print(f"Failed to {operation.lower()} service {result['service']} "
+                      f"({result['latency']:.2f}s): {result['message']}")
+
+        # Report results
+        _printSummary(results, started)
+        
+        return all(result['success'] for result in results)
+        
+    except Exception as e:
+        print(f"Error in service operation: {str(e)}")
+        return False
+
+
+def startStopServices(folderName: str, operation: str, config: Optional[Dict[str, Any]] = None,
+                      maxConcurrent: Optional[int] = None,
+                      onlyChanged: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Start or stop all services in a folder concurrently.
     
-        # Get authentication token
-        print("Authenticating with ArcGIS Server...")
-        token = getToken(username, password, serverName, serverPort)
-        if not token:
-            print("Could not generate a token with the provided credentials.")
-            return False
-            
-        print("Authentication successful")
+    Args:
+        folderName: Name of the folder containing services, or "ROOT"
+        operation: "START" or "STOP"
+        config: Configuration dictionary. If None, will load from config.json
+        maxConcurrent: Maximum number of operations in flight. If None, uses
+                       the 'maxConcurrentOperations' config setting
+        onlyChanged: Skip services already in the target state. If None,
+                     uses the 'onlyChanged' config setting
         
-        # Construct URL to read folder
-        if folderName.upper() == "ROOT":
-            folderPath = ""
-        else:
-            folderPath = f"{folderName}/"
-            
-        folderURL = f"{config['folderUrl']}{folderPath}"
+    Returns:
+        One result per service, see AdminClient.operate
+        
+    Raises:
+        RuntimeError: If no token can be generated or the folder cannot be read
+    """
+    if config is None:
+        config = loadConfig()
+    if onlyChanged is None:
+        onlyChanged = config.get('onlyChanged', False)
+
+    async def run():
+        async with AdminClient(config, maxConcurrent) as client:
+            services = await client.listServiceKeys([folderName])
+            states = await client.snapshot(services) if onlyChanged else None
+            return await client.operateServices(services, operation.upper(), states=states)
 
-        # Get list of services in folder
-        print(f"Reading services from folder '{folderName}'...")
+    return asyncio.run(run())
+
+
+def snapshotServices(folderNames: Optional[List[str]] = None, config: Optional[Dict[str, Any]] = None,
+                     maxConcurrent: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """
+    Read the real-time state of every service concurrently.
+    
+    The states are also written to the status cache ('statusCachePath').
+    
+    Args:
+        folderNames: Names of the folders ("ROOT" for the root folder), or
+                     None for every folder on the site except 'excludeFolders'
+        config: Configuration dictionary. If None, will load from config.json
+        maxConcurrent: Maximum number of requests in flight. If None, uses
+                       the 'maxConcurrentOperations' config setting
         
-        params = urllib.parse.urlencode({'token': token, 'f': 'json'})
-        headers = config['headers']
+    Returns:
+        Dictionary of service key to state, None where it could not be read
+    """
+    if config is None:
+        config = loadConfig()
+
+    async def run():
+        async with AdminClient(config, maxConcurrent) as client:
+            return await client.snapshot(await client.listServiceKeys(folderNames), maxAge=0)
+
+    return asyncio.run(run())
+
+
+def loadStatusCache(config: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the status cache.
+    
+    Args:
+        config: Configuration dictionary. If None, will load from config.json
+        
+    Returns:
+        Dictionary of service key to {'state', 'time'}, empty if there is no cache
+    """
+    if config is None:
+        config = loadConfig()
+    cachePath = config.get('statusCachePath')
+    if not cachePath:
+        return {}
+    try:
+        with open(cachePath, 'r') as cacheFile:
+            return json.load(cacheFile)
+    except (OSError, ValueError):
+        return {}
+
+
+def _updateStatusCache(config: Dict[str, Any], states: Dict[str, Optional[str]]) -> None:
+    # A state of None drops the service, its state is not known any more
+    cachePath = config.get('statusCachePath')
+    if not cachePath or not states:
+        return
+    cache = loadStatusCache(config)
+    now = time.time()
+    for service, state in states.items():
+        if state is None:
+            cache.pop(service, None)
+        else:
+            cache[service] = {'state': state, 'time': now}
+    try:
+        with open(cachePath + '.tmp', 'w') as cacheFile:
+            json.dump(cache, cacheFile, indent=2)
+        os.replace(cachePath + '.tmp', cachePath)
+    except OSError as e:
+        print(f"Warning: Could not write status cache {cachePath}: {str(e)}")
+
+
+def _printSummary(results: List[Dict[str, Any]], started: float) -> None:
+    successCount = sum(1 for result in results if result['success'])
+    totalCount = len(results)
+    print(f"Total services: {totalCount}")
+    print(f"Successful: {successCount}")
+    print(f"Unchanged: {sum(1 for result in results if result['skipped'] and result['success'])}")
+    print(f"Failed: {totalCount - successCount}")
+    print(f"Elapsed: {time.perf_counter() - started:.2f}s")
+
+
+def getFolderPath(folderName: str) -> str:
+    """
+    Get the admin URL path segment of a folder.
+    
+    Args:
+        folderName: Name of the folder, or "ROOT" for the root folder
         
-        # Connect to URL and post parameters    
-        httpConnection = http.client.HTTPConnection(serverName, serverPort)
-        httpConnection.request("POST", folderURL, params, headers)
+    Returns:
+        "" for the root folder, otherwise the folder name followed by "/"
+    """
+    if not folderName or folderName.upper() == "ROOT":
+        return ""
+    return f"{folderName}/"
+
+
+def orchestrate(folderNames: Optional[List[str]], operation: str,
+                onlyChanged: Optional[bool] = None) -> bool:
+    """
+    Start or stop the services of several folders, or the whole site, in plan order.
+    
+    Args:
+        folderNames: Names of the folders ("ROOT" for the root folder), or
+                     None for every folder on the site except 'excludeFolders'
+        operation: "START" or "STOP" operation to perform
+        onlyChanged: Skip services already in the target state. If None,
+                     uses the 'onlyChanged' config setting
         
-        # Read response
-        response = httpConnection.getresponse()
-        if response.status != 200:
-            httpConnection.close()
-            print("Could not read folder information.")
+    Returns:
+        True if all operations were successful, False otherwise
+    """
+    print("ArcGIS Server Service Management Tool")
+    print("This tool stops or starts services in dependency order.\n")
+
+    try:
+        # Load configuration from config.json
+        config = loadConfig()
+
+        # Validate operation parameter
+        if operation.upper() not in ["START", "STOP"]:
+            print("Error: Invalid operation parameter. Use 'START' or 'STOP'.")
             return False
-        else:
-            data = response.read()
-            
-            # Check that data returned is not an error object
-            if not assertJsonSuccess(data):          
-                print(f"Error when reading folder information: {str(data)}")
-                return False
+
+        operation = operation.upper()
+
+        print(f"Operation: {operation} services in {', '.join(folderNames) if folderNames else 'all folders'}")
+        print(f"Server: {config['serverName']}:{config['serverPort']}\n")
+
+        started = time.perf_counter()
+        results = orchestrateServices(folderNames, operation, config, onlyChanged=onlyChanged)
+
+        tier = None
+        for result in results:
+            if result['tier'] != tier:
+                tier = result['tier']
+                print(f"Tier {tier}:")
+            if result['skipped'] and result['success']:
+                print(f"  Service {result['service']} already {result['state']}.")
+            elif result['success']:
+                print(f"  Service {result['service']} {result['state']} ({result['latency']:.2f}s).")
             else:
-                print("Folder information retrieved successfully")
+                print(f"  Failed to {operation.lower()} service {result['service']} "
+                      f"({result['latency']:.2f}s): {result['message']}")
 
-            # Deserialize response into Python object
-            servicesData = json.loads(data)
-            httpConnection.close()
+        # Report results
+        _printSummary(results, started)
 
-            # Check if there are any services in the folder
-            if not servicesData.get('services'):
-                print(f"No services found in folder '{folderName}'")
-                return True
+        return all(result['success'] for result in results)
 
-            print(f"Found {len(servicesData['services'])} service(s) to process...")
-            
-            # Track operation results
-            successCount = 0
-            totalCount = len(servicesData['services'])
-            
-            # Loop through each service in the folder and perform operation    
-            for serviceItem in servicesData['services']:
-                fullServiceName = f"{serviceItem['serviceName']}.{serviceItem['type']}"
-                
-                print(f"Processing service: {fullServiceName}")
-                
-                if processServiceOperation(serverName, serverPort, token, folderPath, 
-                                         fullServiceName, operation, config):
-                    successCount += 1
-            
-            # Report results
-            print(f"Total services: {totalCount}")
-            print(f"Successful: {successCount}")
-            print(f"Failed: {totalCount - successCount}")
-            
-            return successCount == totalCount
-        
     except Exception as e:
         print(f"Error in service operation: {str(e)}")
         return False
 
 
-def processServiceOperation(serverName: str, serverPort: int, token: str, folderPath: str, 
-                          serviceName: str, operation: str, config: Dict[str, Any]) -> bool:
+def orchestrateServices(folderNames: Optional[List[str]], operation: str,
+                        config: Optional[Dict[str, Any]] = None,
+                        maxConcurrent: Optional[int] = None,
+                        onlyChanged: Optional[bool] = None) -> List[Dict[str, Any]]:
     """
-    Execute start or stop operation on a specific service.
+    Start or stop the services of several folders tier by tier.
+    
+    The services are split into tiers with buildServicePlan. The services of
+    a tier are operated on concurrently, and each one must reach the STARTED
+    or STOPPED state before the next tier begins. A service is skipped when
+    a service it waits for (a dependency on START, a dependent on STOP) failed.
     
     Args:
-        serverName: Server hostname
-        serverPort: Server port number
-        token: Authentication token
-        folderPath: Folder path for the service
-        serviceName: Full service name including type
+        folderNames: Names of the folders ("ROOT" for the root folder), or
+                     None for every folder on the site except 'excludeFolders'
         operation: "START" or "STOP"
-        config: Configuration dictionary
+        config: Configuration dictionary. If None, will load from config.json
+        maxConcurrent: Maximum number of requests in flight. If None, uses
+                       the 'maxConcurrentOperations' config setting
+        onlyChanged: Skip services already in the target state. If None,
+                     uses the 'onlyChanged' config setting
         
     Returns:
-        True if operation was successful, False otherwise
+        One result per service in plan order, see AdminClient.operate, each
+        with the 'tier' it ran in
+        
+    Raises:
+        RuntimeError: If no token can be generated or a folder cannot be read
+        ValueError: If the configured dependencies are circular
     """
-    try:
-        # Construct URL to stop or start service                
-        operationURL = f"/arcgis/admin/services/{folderPath}{serviceName}/{operation}"
+    if config is None:
+        config = loadConfig()
+    if onlyChanged is None:
+        onlyChanged = config.get('onlyChanged', False)
+    operation = operation.upper()
+
+    async def run():
+        async with AdminClient(config, maxConcurrent) as client:
+            services = await client.listServiceKeys(folderNames)
+            plan = buildServicePlan(services, operation, config)
+            states = await client.snapshot(services) if onlyChanged else None
+
+            dependencies = _serviceDependencies(services, config)
+            if operation == "STOP":
+                # Dependents must be down before the services they use
+                waitsFor = {service: set() for service in services}
+                for service, serviceDependencies in dependencies.items():
+                    for dependency in serviceDependencies:
+                        waitsFor[dependency].add(service)
+            else:
+                waitsFor = dependencies
+
+            results = []
+            failed = set()
+            for tierNumber, tier in enumerate(plan, 1):
+                runnable = []
+                for service in tier:
+                    blocking = waitsFor[service] & failed
+                    if blocking:
+                        failed.add(service)
+                        results.append({
+                            'service': service,
+                            'operation': operation,
+                            'success': False,
+                            'skipped': True,
+                            'latency': 0.0,
+                            'message': f"Skipped, {', '.join(sorted(blocking))} failed",
+                            'state': None,
+                            'tier': tierNumber
+                        })
+                    else:
+                        runnable.append(service)
+
+                tierResults = await client.operateServices(runnable, operation, wait=True, states=states)
+                for result in tierResults:
+                    result['tier'] = tierNumber
+                    if not result['success']:
+                        failed.add(result['service'])
+                results.extend(tierResults)
+
+            return results
+
+    return asyncio.run(run())
+
+
+def buildServicePlan(services: List[str], operation: str,
+                     config: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+    """
+    Split services into tiers that can each be started or stopped in parallel.
+    
+    A service's tier is its priority from 'servicePriorities' (keyed by
+    service, e.g. "Utilities/Geocoder.GeocodeServer", or by folder, with
+    "ROOT" for the root folder; default 0), raised to one more than the tier
+    of every service it depends on in 'serviceDependencies'. Tiers run in
+    ascending order on START and in descending order on STOP.
+    
+    Args:
+        services: Service keys, i.e. folder path plus full service name
+        operation: "START" or "STOP"
+        config: Configuration dictionary. If None, will load from config.json
         
-        params = urllib.parse.urlencode({'token': token, 'f': 'json'})
-        headers = config['headers']
+    Returns:
+        List of tiers, each a sorted list of service keys
+        
+    Raises:
+        ValueError: If the configured dependencies are circular
+    """
+    if config is None:
+        config = loadConfig()
+    priorities = config.get('servicePriorities', {})
+    dependencies = _serviceDependencies(services, config)
+
+    tiers = {}
+    visiting = set()
+
+    def tierOf(service):
+        if service in tiers:
+            return tiers[service]
+        if service in visiting:
+            raise ValueError(f"Circular service dependency involving {service}")
+        visiting.add(service)
+
+        folder = service.rpartition('/')[0] or "ROOT"
+        tier = priorities.get(service, priorities.get(folder, 0))
+        for dependency in dependencies[service]:
+            tier = max(tier, tierOf(dependency) + 1)
+
+        visiting.discard(service)
+        tiers[service] = tier
+        return tier
+
+    for service in services:
+        tierOf(service)
+
+    plan = [sorted(service for service in services if tiers[service] == tier)
+            for tier in sorted(set(tiers.values()))]
+    if operation.upper() == "STOP":
+        plan.reverse()
+    return plan
+
+
+def _serviceDependencies(services: List[str], config: Dict[str, Any]) -> Dict[str, set]:
+    # Dependencies on services outside the plan are ignored
+    configured = config.get('serviceDependencies', {})
+    inPlan = set(services)
+    return {service: set(configured.get(service, [])) & inPlan for service in services}
+
+
+def splitServiceKey(service: str) -> Tuple[str, str]:
+    """
+    Split a service key into its folder path and full service name.
+    
+    Args:
+        service: Service key, e.g. "Utilities/Pumps.MapServer"
         
-        httpConnection = http.client.HTTPConnection(serverName, serverPort)
-        httpConnection.request("POST", operationURL, params, headers)
+    Returns:
+        Tuple of (folder path, see getFolderPath, full service name)
+    """
+    folder, _, serviceName = service.rpartition('/')
+    return getFolderPath(folder), serviceName
+
+
+class AdminClient:
+    """
+    Asyncio client for the ArcGIS Server admin API.
+    
+    Requests share a pool of keep-alive connections, with at most
+    maxConcurrent requests in flight at once. The admin token comes from the
+    shared token manager and a request the server rejects with an invalid
+    token error is re-issued once with a new token.
+    
+    Use as an async context manager:
+    
+        async with AdminClient(config) as client:
+            results = await client.operateAll("Utilities/", names, "STOP")
+    
+    Attributes:
+        config (dict): myServices configuration
+        maxConcurrent (int): Maximum number of requests in flight
+        token (str): Current admin token
+        stats (dict): Number of connections 'created' and 'reused'
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, maxConcurrent: Optional[int] = None):
+        """
+        Initialize the admin client.
         
-        # Read operation response
-        operationResponse = httpConnection.getresponse()
-        if operationResponse.status != 200:
-            httpConnection.close()
-            print(f"Error while executing {operation.lower()} operation. Status: {operationResponse.status}")
-            return False
-        else:
-            operationData = operationResponse.read()
-            httpConnection.close()
+        Args:
+            config: Configuration dictionary. If None, will load from config.json
+            maxConcurrent: Maximum number of requests in flight. If None, uses
+                           the 'maxConcurrentOperations' config setting
+        """
+        if config is None:
+            config = loadConfig()
+        self.config = config
+        self.serverName = config['serverName']
+        self.serverPort = config['serverPort']
+        self.maxConcurrent = max(1, maxConcurrent or config.get('maxConcurrentOperations', 8))
+        self.token = None
+        self.stats = {'created': 0, 'reused': 0}
+        self._ssl = ssl.create_default_context() if config.get('useSSL', False) else None
+        self._idle = []
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'AdminClient':
+        # Created here so it belongs to the running event loop
+        self._semaphore = asyncio.Semaphore(self.maxConcurrent)
+        self.token = await self._getToken()
+        if not self.token:
+            raise RuntimeError("Could not generate a token with the provided credentials.")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        idle, self._idle = self._idle, []
+        for reader, writer in idle:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def call(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        POST to an admin URL and return the JSON response.
+        
+        Args:
+            path: URL path, e.g. "/arcgis/admin/services/Utilities/Pumps.MapServer/status"
+            params: Request parameters besides the token and format
             
-            # Check that data returned is not an error object
-            if not assertJsonSuccess(operationData):
-                print(f"Error returned when {operation.lower()}ing service {serviceName}.")
-                print(str(operationData))
-                return False
+        Returns:
+            Parsed JSON response, which may be an error object
+            
+        Raises:
+            RuntimeError: If the server does not answer with status 200
+        """
+        for attempt in range(2):
+            token = self.token
+            body = urllib.parse.urlencode(dict(params or {}, token=token, f='json'))
+            status, data = await self._post(path, body.encode('utf-8'))
+            if status != 200:
+                raise RuntimeError(f"HTTP status {status} from {path}")
+
+            # Re-issue the request once with a new token if the server rejected it
+            if attempt == 0 and isInvalidToken(data):
+                newToken = await self._getToken(token)
+                if newToken:
+                    self.token = newToken
+                    continue
+            break
+
+        return json.loads(data)
+
+    async def listServices(self, folderName: str) -> List[str]:
+        """
+        List the services in a folder.
+        
+        Args:
+            folderName: Name of the folder, or "ROOT"
+            
+        Returns:
+            Full service names including type, e.g. "Pumps.MapServer"
+            
+        Raises:
+            RuntimeError: If the folder cannot be read
+        """
+        data = await self.call(f"{self.config['folderUrl']}{getFolderPath(folderName)}")
+        if data.get('status') == "error":
+            raise RuntimeError(f"Error when reading folder information: {str(data)}")
+        return [f"{item['serviceName']}.{item['type']}" for item in data.get('services', [])]
+
+    async def listServiceKeys(self, folderNames: Optional[List[str]] = None) -> List[str]:
+        """
+        List the services of several folders concurrently.
+        
+        Args:
+            folderNames: Names of the folders ("ROOT" for the root folder), or
+                         None for every folder on the site except 'excludeFolders'
+            
+        Returns:
+            Service keys, i.e. folder path plus full service name
+            
+        Raises:
+            RuntimeError: If a folder cannot be read
+        """
+        folders = folderNames
+        if not folders:
+            excluded = self.config.get('excludeFolders', ["System", "Utilities"])
+            folders = [""] + [folder for folder in await self.listFolders() if folder not in excluded]
+
+        listings = await asyncio.gather(*(self.listServices(folder) for folder in folders))
+        return [f"{getFolderPath(folder)}{serviceName}"
+                for folder, serviceNames in zip(folders, listings)
+                for serviceName in serviceNames]
+
+    async def listFolders(self) -> List[str]:
+        """
+        List the folders of the site.
+        
+        Returns:
+            Folder names, not including the root folder
+            
+        Raises:
+            RuntimeError: If the root folder cannot be read
+        """
+        data = await self.call(self.config['folderUrl'])
+        if data.get('status') == "error":
+            raise RuntimeError(f"Error when reading folder information: {str(data)}")
+        return list(data.get('folders', []))
+
+    async def getState(self, folderPath: str, serviceName: str) -> Optional[str]:
+        """
+        Get the real-time state of a service.
+        
+        Args:
+            folderPath: Folder path of the service, see getFolderPath
+            serviceName: Full service name including type
+            
+        Returns:
+            "STARTED", "STOPPED", "STARTING", "STOPPING", or None if unknown
+        """
+        data = await self.call(f"{self.config['folderUrl']}{folderPath}{serviceName}/status")
+        return data.get('realTimeState')
+
+    async def snapshot(self, services: List[str], maxAge: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Get the real-time state of several services.
+        
+        States in the status cache younger than maxAge seconds are used as
+        is; the others are read concurrently and written to the cache.
+        
+        Args:
+            services: Service keys, i.e. folder path plus full service name
+            maxAge: Maximum age of a cached state in seconds. If None, uses the
+                    'statusCacheTTL' config setting
+            
+        Returns:
+            Dictionary of service key to state, None where it could not be read
+        """
+        if maxAge is None:
+            maxAge = self.config.get('statusCacheTTL', 0)
+
+        states = {}
+        if maxAge > 0:
+            now = time.time()
+            for service, cached in loadStatusCache(self.config).items():
+                if now - cached.get('time', 0) <= maxAge:
+                    states[service] = cached.get('state')
+
+        async def stateOf(service):
+            try:
+                return await self.getState(*splitServiceKey(service))
+            except Exception as e:
+                print(f"Warning: Could not read the state of {service}: {str(e)}")
+                return None
+
+        missing = [service for service in services if service not in states]
+        fetched = dict(zip(missing, await asyncio.gather(*(stateOf(service) for service in missing))))
+        _updateStatusCache(self.config, fetched)
+
+        states.update(fetched)
+        return {service: states[service] for service in services}
+
+    async def waitForState(self, folderPath: str, serviceName: str, state: str,
+                           timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Poll the state of a service until it reaches the given state or the timeout expires.
+        
+        Args:
+            folderPath: Folder path of the service, see getFolderPath
+            serviceName: Full service name including type
+            state: State to wait for, "STARTED" or "STOPPED"
+            timeout: Seconds to wait. If None, uses the 'statusTimeout' config setting
+            
+        Returns:
+            The last state read
+        """
+        if timeout is None:
+            timeout = self.config.get('statusTimeout', 300)
+        interval = self.config.get('statusPollInterval', 2)
+        deadline = time.monotonic() + timeout
+
+        while True:
+            current = await self.getState(folderPath, serviceName)
+            if current == state or time.monotonic() >= deadline:
+                return current
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+    async def operate(self, folderPath: str, serviceName: str, operation: str,
+                      wait: bool = False) -> Dict[str, Any]:
+        """
+        Execute an operation on a single service.
+        
+        Args:
+            folderPath: Folder path of the service, see getFolderPath
+            serviceName: Full service name including type
+            operation: Admin operation, e.g. "START" or "STOP"
+            wait: Wait for a START or STOP to reach the STARTED or STOPPED
+                  state; the operation only succeeds if it does
+            
+        Returns:
+            Dictionary with 'service', 'operation', 'success', 'latency'
+            (seconds, including time waiting for a free connection and for
+            the state), 'message' (the server's error messages, if any) and
+            'state' (the last state read, or None if not waited for)
+        """
+        started = time.perf_counter()
+        state = None
+        try:
+            data = await self.call(f"{self.config['folderUrl']}{folderPath}{serviceName}/{operation}")
+            success = data.get('status') != "error"
+            message = "; ".join(data.get('messages', [])) if not success else ""
+
+            target = SERVICE_STATES.get(operation)
+            if success and wait and target:
+                state = await self.waitForState(folderPath, serviceName, target)
+                if state != target:
+                    success = False
+                    message = f"Service is {state}, expected {target}"
+        except Exception as e:
+            success = False
+            message = str(e)
+
+        return {
+            'service': f"{folderPath}{serviceName}",
+            'operation': operation,
+            'success': success,
+            'latency': time.perf_counter() - started,
+            'message': message,
+            'state': state,
+            'skipped': False
+        }
+
+    async def operateAll(self, folderPath: str, serviceNames: List[str], operation: str,
+                         wait: bool = False) -> List[Dict[str, Any]]:
+        """
+        Execute an operation on several services concurrently.
+        
+        Args:
+            folderPath: Folder path of the services, see getFolderPath
+            serviceNames: Full service names including type
+            operation: Admin operation, e.g. "START" or "STOP"
+            wait: Wait for each service to reach the target state, see operate
+            
+        Returns:
+            One result per service, in the order of serviceNames
+        """
+        return list(await asyncio.gather(*(self.operate(folderPath, serviceName, operation, wait)
+                                           for serviceName in serviceNames)))
+
+    async def operateServices(self, services: List[str], operation: str, wait: bool = False,
+                              states: Optional[Dict[str, Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Execute an operation on services from several folders concurrently.
+        
+        Services whose state in states is already the operation's target
+        state are not sent the operation; their result has 'skipped' set.
+        The status cache is updated with the outcome.
+        
+        Args:
+            services: Service keys, i.e. folder path plus full service name
+            operation: Admin operation, e.g. "START" or "STOP"
+            wait: Wait for each service to reach the target state, see operate
+            states: Known service states, see snapshot. If None, every service is operated on
+            
+        Returns:
+            One result per service, in the order of services
+        """
+        target = SERVICE_STATES.get(operation)
+        results = {}
+        pending = []
+        for service in services:
+            if states and target and states.get(service) == target:
+                results[service] = {
+                    'service': service,
+                    'operation': operation,
+                    'success': True,
+                    'latency': 0.0,
+                    'message': f"Already {target}",
+                    'state': target,
+                    'skipped': True
+                }
             else:
-                print(f"Service {serviceName} {operation.lower()}ped successfully.")
-                return True
-                
-    except Exception as e:
-        print(f"Failed to {operation.lower()} service {serviceName}: {str(e)}")
-        return False
+                pending.append(service)
+
+        operated = await asyncio.gather(*(self.operate(*splitServiceKey(service), operation, wait)
+                                          for service in pending))
+        # Without waiting the state after the operation is unknown
+        _updateStatusCache(self.config, {result['service']: result['state'] for result in operated})
+        results.update((result['service'], result) for result in operated)
+        return [results[service] for service in services]
+
+    async def _getToken(self, invalidToken: Optional[str] = None) -> Optional[str]:
+        # getToken blocks on http.client, so run it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, getToken, self.config['username'],
+                                          self.config['password'], self.serverName,
+                                          self.serverPort, self.config, invalidToken)
+
+    async def _post(self, path: str, body: bytes) -> Tuple[int, bytes]:
+        headers = "".join(f"{key}: {value}\r\n" for key, value in self.config['headers'].items())
+        request = (f"POST {path} HTTP/1.1\r\n"
+                   f"Host: {self.serverName}:{self.serverPort}\r\n"
+                   f"{headers}"
+                   f"Content-Length: {len(body)}\r\n"
+                   f"Connection: keep-alive\r\n\r\n").encode('latin-1') + body
+
+        async with self._semaphore:
+            for attempt in range(2):
+                reader, writer, reused = await self._acquire(fresh=attempt > 0)
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status, data, keepAlive = await _readResponse(reader)
+                except (OSError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # The server may have closed an idle keep-alive connection
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+                if keepAlive:
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, data
+
+    async def _acquire(self, fresh: bool = False) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        while self._idle and not fresh:
+            reader, writer = self._idle.pop()
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            self.stats['reused'] += 1
+            return reader, writer, True
+
+        reader, writer = await asyncio.open_connection(self.serverName, self.serverPort, ssl=self._ssl)
+        self.stats['created'] += 1
+        return reader, writer, False
+
+
+async def _readResponse(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+    """
+    Read an HTTP/1.1 response.
+    
+    Returns:
+        Tuple of (status, body, whether the connection can be reused)
+    """
+    statusLine = await reader.readline()
+    if not statusLine:
+        raise ConnectionResetError("Connection closed by server")
+    version, status = statusLine.decode('latin-1').split(None, 2)[:2]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode('latin-1').partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    keepAlive = version == "HTTP/1.1" and headers.get('connection', "").lower() != "close"
 
+    if headers.get('transfer-encoding', "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        data = b"".join(chunks)
+    elif 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+    else:
+        data = await reader.read()
+        keepAlive = False
 
-def getToken(username: str, password: str, serverName: str, serverPort: int) -> Optional[str]:
+    return int(status), data, keepAlive
+
+
+def getToken(username: str, password: str, serverName: str, serverPort: int,
+             config: Optional[Dict[str, Any]] = None, invalidToken: Optional[str] = None) -> Optional[str]:
     """
-    Generate an authentication token for ArcGIS Server admin operations.
+    Get an authentication token for ArcGIS Server admin operations.
+    
+    Tokens come from the shared token manager, so a new token is only
+    generated when there is no cached token for this server and user, the
+    cached one is about to expire, or the server rejected it.
     
     Args:
         username: Admin username
         password: Admin password  
         serverName: Server hostname
         serverPort: Server port number
+        config: Configuration dictionary. If None, will load from config.json
+        invalidToken: Token the server just rejected
         
     Returns:
         Authentication token string, or None if authentication fails
     """
     try:
-        # Load configuration from config.json
-        config = loadConfig()
+        if config is None:
+            config = loadConfig()
 
         # Token URL is typically http://server[:port]/arcgis/admin/generateToken
         tokenURL = config['tokenUrl']
@@ -225,34 +913,58 @@ def getToken(username: str, password: str, serverName: str, serverPort: int) ->
         })
 
         headers = config['headers']
-        
-        # Connect to URL and post parameters
-        httpConnection = http.client.HTTPConnection(serverName, serverPort)
-        httpConnection.request("POST", tokenURL, params, headers)
-        
-        # Read response
-        response = httpConnection.getresponse()
-        if response.status != 200:
-            httpConnection.close()
-            print(f"Error while fetching tokens from admin URL. Status: {response.status}")
-            return None
-        else:
+
+        def fetch():
+            # Connect to URL and post parameters, over TLS like the AdminClient if configured
+            if config.get('useSSL', False):
+                httpConnection = http.client.HTTPSConnection(serverName, serverPort,
+                                                             context=ssl.create_default_context())
+            else:
+                httpConnection = http.client.HTTPConnection(serverName, serverPort)
+            httpConnection.request("POST", tokenURL, params, headers)
+            
+            # Read response
+            response = httpConnection.getresponse()
+            if response.status != 200:
+                httpConnection.close()
+                raise RuntimeError(f"Error while fetching tokens from admin URL. Status: {response.status}")
+
             data = response.read()
             httpConnection.close()
             
             # Check that data returned is not an error object
             if not assertJsonSuccess(data):            
-                return None
+                raise RuntimeError("Token request returned an error")
             
-            # Extract the token from it
-            tokenData = json.loads(data)        
-            return tokenData['token']
+            # Extract the token and its expiry (epoch milliseconds) from it
+            tokenData = json.loads(data)
+            expires = tokenData.get('expires', (time.time() + 60 * 60) * 1000)
+            return tokenData['token'], float(expires) / 1000.0
+
+        return mytoken.getTokenManager().getToken(f"{serverName}:{serverPort}", username,
+                                                  fetch, invalidToken)
             
     except Exception as e:
         print(f"Failed to get authentication token: {str(e)}")
         return None            
         
 
+def isInvalidToken(data: bytes) -> bool:
+    """
+    Check whether a raw server response rejects the token that was sent.
+    
+    Args:
+        data: Raw response data from server
+        
+    Returns:
+        True if the response is an invalid or expired token error
+    """
+    try:
+        return mytoken.isInvalidTokenError(json.loads(data))
+    except json.JSONDecodeError:
+        return False
+
+
 def assertJsonSuccess(data: bytes) -> bool:
     """
     Check that the input JSON response is not an error object.
@@ -277,10 +989,20 @@ def assertJsonSuccess(data: bytes) -> bool:
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
-        print("Usage: python myservices.py <folder> <START|STOP>")
+        print("Usage: python myservices.py <folder[,folder...]|SITE> <START|STOP|STATUS>")
         print("Example: python myservices.py ROOT START")
+        print("Example: python myservices.py Utilities,Public STOP")
         sys.exit(1)
     
     folder = sys.argv[1]
     startstop = sys.argv[2]
-    startStopService(folder, startstop)
+    if startstop.upper() == "STATUS":
+        folders = None if folder.upper() == "SITE" else [name.strip() for name in folder.split(",") if name.strip()]
+        for service, state in sorted(snapshotServices(folders).items()):
+            print(f"{service}: {state or 'UNKNOWN'}")
+    elif folder.upper() == "SITE":
+        orchestrate(None, startstop)
+    elif "," in folder:
+        orchestrate([name.strip() for name in folder.split(",") if name.strip()], startstop)
+    else:
+        startStopService(folder, startstop)
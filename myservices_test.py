@@ -0,0 +1,179 @@
+import asyncio
+import unittest
+
+import myservices
+
+
+class BuildServicePlanTest(unittest.TestCase):
+
+    SERVICES = ["Geocode.GeocodeServer",
+                "Ops/Pumps.FeatureServer",
+                "Ops/Valves.FeatureServer",
+                "Public/Viewer.MapServer"]
+
+    def test_single_tier_without_settings(self):
+        plan = myservices.buildServicePlan(self.SERVICES, "START", {})
+        self.assertEqual(plan, [sorted(self.SERVICES)])
+
+    def test_priorities_by_service_and_folder(self):
+        config = {'servicePriorities': {"ROOT": 0, "Ops": 1, "Ops/Valves.FeatureServer": 3}}
+        plan = myservices.buildServicePlan(self.SERVICES, "START", config)
+        self.assertEqual(plan, [["Geocode.GeocodeServer", "Public/Viewer.MapServer"],
+                                ["Ops/Pumps.FeatureServer"],
+                                ["Ops/Valves.FeatureServer"]])
+
+    def test_dependencies_start_first_and_stop_last(self):
+        config = {'serviceDependencies': {
+            "Public/Viewer.MapServer": ["Ops/Pumps.FeatureServer", "Ops/Valves.FeatureServer"],
+            "Ops/Pumps.FeatureServer": ["Geocode.GeocodeServer"]}}
+
+        start = myservices.buildServicePlan(self.SERVICES, "START", config)
+        self.assertEqual(start, [["Geocode.GeocodeServer", "Ops/Valves.FeatureServer"],
+                                 ["Ops/Pumps.FeatureServer"],
+                                 ["Public/Viewer.MapServer"]])
+        self.assertEqual(myservices.buildServicePlan(self.SERVICES, "STOP", config), start[::-1])
+
+    def test_dependency_raises_priority(self):
+        config = {'servicePriorities': {"Ops/Pumps.FeatureServer": 5},
+                  'serviceDependencies': {"Public/Viewer.MapServer": ["Ops/Pumps.FeatureServer"]}}
+        plan = myservices.buildServicePlan(self.SERVICES, "START", config)
+        self.assertEqual(plan[-2:], [["Ops/Pumps.FeatureServer"], ["Public/Viewer.MapServer"]])
+
+    def test_dependencies_outside_plan_are_ignored(self):
+        config = {'serviceDependencies': {"Ops/Pumps.FeatureServer": ["Other/Missing.MapServer"]}}
+        plan = myservices.buildServicePlan(["Ops/Pumps.FeatureServer"], "START", config)
+        self.assertEqual(plan, [["Ops/Pumps.FeatureServer"]])
+
+    def test_circular_dependencies(self):
+        config = {'serviceDependencies': {"Ops/Pumps.FeatureServer": ["Ops/Valves.FeatureServer"],
+                                          "Ops/Valves.FeatureServer": ["Ops/Pumps.FeatureServer"]}}
+        with self.assertRaises(ValueError):
+            myservices.buildServicePlan(self.SERVICES, "START", config)
+
+
+class ReadResponseTest(unittest.TestCase):
+
+    def read(self, data):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return await myservices._readResponse(reader), await reader.read()
+        return asyncio.run(run())
+
+    def test_content_length(self):
+        response, rest = self.read(b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhelloHTTP/1.1")
+        self.assertEqual(response, (200, b"hello", True))
+        self.assertEqual(rest, b"HTTP/1.1")
+
+    def test_chunked_with_extension_and_trailer(self):
+        response, rest = self.read(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                                   b"5;name=value\r\nhello\r\n1\r\n!\r\n0\r\nX-Trailer: 1\r\n\r\nnext")
+        self.assertEqual(response, (200, b"hello!", True))
+        self.assertEqual(rest, b"next")
+
+    def test_connection_close(self):
+        response, _ = self.read(b"HTTP/1.1 500 Error\r\nConnection: close\r\nContent-Length: 2\r\n\r\n{}")
+        self.assertEqual(response, (500, b"{}", False))
+
+    def test_body_until_close(self):
+        response, _ = self.read(b"HTTP/1.0 200 OK\r\n\r\n{\"status\": \"success\"}")
+        self.assertEqual(response, (200, b'{"status": "success"}', False))
+
+    def test_closed_before_status(self):
+        with self.assertRaises(ConnectionResetError):
+            self.read(b"")
+
+
+class AdminClientPostTest(unittest.TestCase):
+    """
+    Runs AdminClient._post against a local server answering each request
+    with the next of self.responses, closing the connection after it when
+    the response is paired with True. A response of None closes the
+    connection without answering.
+    """
+
+    def setUp(self):
+        self.responses = []
+        self.connections = 0
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+                self.requests.append(await reader.readexactly(length))
+                response, close = self.responses.pop(0)
+                if response is None:
+                    break
+                writer.write(response)
+                await writer.drain()
+                if close:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    def post(self, count):
+        async def run():
+            server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            client = myservices.AdminClient({'serverName': '127.0.0.1', 'serverPort': port, 'headers': {}})
+            client._semaphore = asyncio.Semaphore(client.maxConcurrent)
+            try:
+                results = []
+                for number in range(count):
+                    results.append(await client._post("/arcgis/admin/test", f"n={number}".encode()))
+                    await asyncio.sleep(0.05)
+                return results, client.stats
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run())
+
+    def test_keep_alive_connection_is_reused(self):
+        self.responses = [(b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\na", False),
+                          (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n1\r\nb\r\n0\r\n\r\n", False),
+                          (b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nc", False)]
+
+        results, stats = self.post(3)
+        self.assertEqual(results, [(200, b"a"), (200, b"b"), (200, b"c")])
+        self.assertEqual(self.requests, [b"n=0", b"n=1", b"n=2"])
+        self.assertEqual(stats, {'created': 1, 'reused': 2})
+        self.assertEqual(self.connections, 1)
+
+    def test_connection_close_is_not_reused(self):
+        self.responses = [(b"HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 1\r\n\r\na", True),
+                          (b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nb", False)]
+
+        results, stats = self.post(2)
+        self.assertEqual(results, [(200, b"a"), (200, b"b")])
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(self.connections, 2)
+
+    def test_idle_connection_closed_by_server(self):
+        # The server drops the connection without saying so, as on an idle timeout
+        self.responses = [(b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\na", True),
+                          (b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nb", False)]
+
+        results, stats = self.post(2)
+        self.assertEqual(results, [(200, b"a"), (200, b"b")])
+        self.assertEqual(self.requests, [b"n=0", b"n=1"])
+        self.assertEqual(self.connections, 2)
+
+    def test_reused_connection_failing_is_retried_once(self):
+        self.responses = [(b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\na", False),
+                          (None, True),
+                          (b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\nb", False)]
+
+        results, stats = self.post(2)
+        self.assertEqual(results, [(200, b"a"), (200, b"b")])
+        self.assertEqual(self.requests, [b"n=0", b"n=1", b"n=1"])
+        self.assertEqual(stats, {'created': 2, 'reused': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
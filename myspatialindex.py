@@ -0,0 +1,206 @@
+import itertools
+import math
+import random
+import sys
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+Envelope = Tuple[float, float, float, float]
+
+
+class GridIndex:
+    """
+    Uniform grid over item envelopes, for finding the items near a point or box.
+
+    Each item is registered in every grid cell its envelope overlaps, so a
+    lookup only has to look at the items of the cells the query touches
+    instead of every item. Items covering more cells than there are items,
+    and queries doing the same, are checked directly instead, so the work
+    per item or query never exceeds a plain scan. Items are identified by
+    their position in the list of envelopes the index was built from.
+
+    Attributes:
+        envelopes (list): (xmin, ymin, xmax, ymax) of each item
+        cellsize (float): Width and height of a grid cell
+    """
+
+    def __init__(self, envelopes: Iterable[Envelope], cellsize: Optional[float] = None):
+        """
+        Build the index.
+
+        Args:
+            envelopes: (xmin, ymin, xmax, ymax) of each item
+            cellsize: Width and height of a grid cell. If None, uses the larger
+                      of the mean envelope width and height and the cell size
+                      giving about one item per cell over the extent of all
+                      items, which keeps both the number of cells per item
+                      and items per cell small, also for points
+        """
+        self.envelopes = list(envelopes)
+        if cellsize is None:
+            cellsize = self._defaultcellsize()
+        self.cellsize = cellsize if cellsize > 0 else 1.0
+
+        self._cells = {}
+        self._large = []
+        for index, envelope in enumerate(self.envelopes):
+            if self._cellcount(*envelope) > len(self.envelopes):
+                self._large.append(index)
+                continue
+            for key in self._keys(*envelope):
+                self._cells.setdefault(key, []).append(index)
+
+    def query(self, xmin: float, ymin: float, xmax: Optional[float] = None,
+              ymax: Optional[float] = None) -> List[int]:
+        """
+        Find the items whose envelope intersects a box or contains a point.
+
+        Args:
+            xmin, ymin: Lower left corner of the box, or the point
+            xmax, ymax: Upper right corner of the box. If None, the query is a point
+
+        Returns:
+            Item indexes in ascending order
+        """
+        if xmax is None:
+            xmax, ymax = xmin, ymin
+
+        if self._cellcount(xmin, ymin, xmax, ymax) > len(self.envelopes):
+            candidates = range(len(self.envelopes))
+        else:
+            candidates = itertools.chain(self._large, (index for key in self._keys(xmin, ymin, xmax, ymax)
+                                                       for index in self._cells.get(key, ())))
+
+        found = set()
+        for index in candidates:
+            if index not in found:
+                exmin, eymin, exmax, eymax = self.envelopes[index]
+                if exmin <= xmax and xmin <= exmax and eymin <= ymax and ymin <= eymax:
+                    found.add(index)
+        return sorted(found)
+
+    def _defaultcellsize(self) -> float:
+        count = len(self.envelopes)
+        if not count:
+            return 1.0
+        xmin = min(envelope[0] for envelope in self.envelopes)
+        ymin = min(envelope[1] for envelope in self.envelopes)
+        xmax = max(envelope[2] for envelope in self.envelopes)
+        ymax = max(envelope[3] for envelope in self.envelopes)
+        mean = sum((exmax - exmin) + (eymax - eymin)
+                   for exmin, eymin, exmax, eymax in self.envelopes) / (2 * count)
+        width, height = xmax - xmin, ymax - ymin
+        if width > 0 and height > 0:
+            spread = math.sqrt(width * height / count)
+        else:
+            # Items on a line: spread them along it
+            spread = max(width, height) / count
+        return max(mean, spread)
+
+    def _cellcount(self, xmin: float, ymin: float, xmax: float, ymax: float) -> int:
+        size = self.cellsize
+        return ((math.floor(xmax / size) - math.floor(xmin / size) + 1) *
+                (math.floor(ymax / size) - math.floor(ymin / size) + 1))
+
+    def _keys(self, xmin: float, ymin: float, xmax: float, ymax: float):
+        size = self.cellsize
+        for ix in range(math.floor(xmin / size), math.floor(xmax / size) + 1):
+            for iy in range(math.floor(ymin / size), math.floor(ymax / size) + 1):
+                yield ix, iy
+
+
+def pointInPolygon(x: float, y: float, rings: Sequence[Sequence[Tuple[float, float]]]) -> bool:
+    """
+    Check whether a point lies inside a polygon, using the even-odd rule.
+
+    Holes are handled by passing them as additional rings. Points exactly on
+    the boundary may fall either way.
+
+    Args:
+        x, y: Point coordinates
+        rings: Polygon rings, each a sequence of (x, y) vertices
+
+    Returns:
+        True if the point is inside the polygon
+    """
+    inside = False
+    for ring in rings:
+        count = len(ring)
+        for i in range(count):
+            x1, y1 = ring[i]
+            x2, y2 = ring[(i + 1) % count]
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+    return inside
+
+
+def ringEnvelope(rings: Sequence[Sequence[Tuple[float, float]]]) -> Envelope:
+    """
+    Get the envelope of a polygon.
+
+    Args:
+        rings: Polygon rings, each a sequence of (x, y) vertices
+
+    Returns:
+        (xmin, ymin, xmax, ymax)
+    """
+    xs = [x for ring in rings for x, y in ring]
+    ys = [y for ring in rings for x, y in ring]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def benchmark(polygonCount: int = 10000, pointCount: int = 100000, seed: int = 1) -> None:
+    """
+    Time point-in-polygon lookups with and without the grid index on synthetic data.
+
+    The polygons are randomly jittered squares covering a square area, the
+    points are uniformly random. Brute force is only timed on a sample of
+    the points and extrapolated.
+
+    Args:
+        polygonCount: Number of polygons
+        pointCount: Number of points
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    side = max(1, int(math.sqrt(polygonCount)))
+    polygons = []
+    for i in range(side):
+        for j in range(side):
+            x, y = i + rng.uniform(-0.1, 0.1), j + rng.uniform(-0.1, 0.1)
+            polygons.append([[(x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1)]])
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(pointCount)]
+
+    def first(candidates, x, y):
+        for index in candidates:
+            if pointInPolygon(x, y, polygons[index]):
+                return index
+        return None
+
+    start = time.perf_counter()
+    index = GridIndex(ringEnvelope(rings) for rings in polygons)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [first(index.query(x, y), x, y) for x, y in points]
+    lookup = time.perf_counter() - start
+
+    sample = points[:max(1, min(pointCount, 200000 // len(polygons)))]
+    start = time.perf_counter()
+    brute = [first(range(len(polygons)), x, y) for x, y in sample]
+    bruteTime = (time.perf_counter() - start) * len(points) / len(sample)
+
+    mismatches = sum(1 for a, b in zip(indexed, brute) if a != b)
+    print(f"{len(polygons)} polygons, {len(points)} points")
+    print(f"Grid index: build {built:.3f}s, lookup {lookup:.3f}s ({index.cellsize:.2f} cell size)")
+    print(f"Brute force: ~{bruteTime:.3f}s (estimated from {len(sample)} points)")
+    print(f"Mismatches in sample: {mismatches}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print("Usage: python myspatialindex.py [polygons] [points]")
+        sys.exit(1)
+
+    benchmark(*(int(arg) for arg in sys.argv[1:]))
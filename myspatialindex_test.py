@@ -0,0 +1,77 @@
+import random
+import unittest
+
+import myspatialindex
+
+
+class GridIndexTest(unittest.TestCase):
+
+    def test_point_and_box_queries(self):
+        index = myspatialindex.GridIndex([(0, 0, 1, 1), (2, 2, 3, 3), (0.5, 0.5, 2.5, 2.5)])
+
+        self.assertEqual(index.query(0.25, 0.25), [0])
+        self.assertEqual(index.query(0.75, 0.75), [0, 2])
+        self.assertEqual(index.query(5, 5), [])
+        self.assertEqual(index.query(-1, -1, 10, 10), [0, 1, 2])
+        self.assertEqual(index.query(1.5, 1.5, 2.1, 2.1), [1, 2])
+
+    def test_boundary_counts_as_intersecting(self):
+        index = myspatialindex.GridIndex([(0, 0, 1, 1)], cellsize=0.5)
+        self.assertEqual(index.query(1, 1), [0])
+        self.assertEqual(index.query(1, 0, 2, 0), [0])
+
+    def test_empty_and_degenerate_indexes(self):
+        self.assertEqual(myspatialindex.GridIndex([]).query(0, 0), [])
+
+        points = myspatialindex.GridIndex([(1, 1, 1, 1), (-2, 3, -2, 3)])
+        self.assertEqual(points.query(-2, 3), [1])
+        self.assertEqual(myspatialindex.GridIndex([(5, 5, 5, 5)]).cellsize, 1.0)
+
+    def test_point_cellsize_follows_extent(self):
+        rng = random.Random(3)
+        points = [(x, y, x, y) for x, y in ((rng.uniform(0, 20000), rng.uniform(0, 20000))
+                                            for _ in range(1000))]
+        index = myspatialindex.GridIndex(points)
+        self.assertAlmostEqual(index.cellsize, 20000 / 1000 ** 0.5, delta=50)
+
+        expected = [i for i, (x, y, _, _) in enumerate(points) if 1000 <= x <= 3000 and 1000 <= y <= 3000]
+        self.assertEqual(index.query(1000, 1000, 3000, 3000), expected)
+
+    def test_huge_boxes_scan_instead_of_visiting_cells(self):
+        index = myspatialindex.GridIndex([(0, 0, 1, 1), (2, 2, 3, 3), (0, 0, 1e9, 1e9)], cellsize=1)
+        # Would visit 1e18 cells without the cap
+        self.assertEqual(index.query(-1e9, -1e9, 1e9, 1e9), [0, 1, 2])
+        self.assertEqual(index.query(2.5, 2.5), [1, 2])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        envelopes = []
+        for _ in range(500):
+            x, y = rng.uniform(-50, 50), rng.uniform(-50, 50)
+            envelopes.append((x, y, x + rng.uniform(0, 10), y + rng.uniform(0, 3)))
+        index = myspatialindex.GridIndex(envelopes)
+
+        for _ in range(200):
+            x, y = rng.uniform(-60, 60), rng.uniform(-60, 60)
+            box = (x, y, x + rng.uniform(0, 5), y + rng.uniform(0, 5))
+            expected = [i for i, (xmin, ymin, xmax, ymax) in enumerate(envelopes)
+                        if xmin <= box[2] and box[0] <= xmax and ymin <= box[3] and box[1] <= ymax]
+            self.assertEqual(index.query(*box), expected)
+
+
+class PointInPolygonTest(unittest.TestCase):
+
+    SQUARE = [(0, 0), (4, 0), (4, 4), (0, 4)]
+    HOLE = [(1, 1), (3, 1), (3, 3), (1, 3)]
+
+    def test_inside_outside_and_hole(self):
+        self.assertTrue(myspatialindex.pointInPolygon(0.5, 0.5, [self.SQUARE, self.HOLE]))
+        self.assertFalse(myspatialindex.pointInPolygon(2, 2, [self.SQUARE, self.HOLE]))
+        self.assertFalse(myspatialindex.pointInPolygon(5, 2, [self.SQUARE, self.HOLE]))
+
+    def test_ring_envelope(self):
+        self.assertEqual(myspatialindex.ringEnvelope([self.SQUARE, [(-1, 2), (0, 5)]]), (-1, 0, 4, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
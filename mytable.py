@@ -1,4 +1,8 @@
 import arcpy, os
+import contextlib
+import hashlib
+
+import myfeatureclass
 
 class mytable:
     def __init__(self, table):
@@ -61,16 +65,23 @@ class mytable:
         """
         return self.table
 
-    def updatetable(self, sourcetable):
+    def updatetable(self, sourcetable, keyfields=None):
         """
         Update the target table with data from a source table.
 
         This method intelligently chooses between DeleteRows (for versioned tables)
         and TruncateTable (for non-versioned tables) for optimal performance.
         After clearing the target table, it appends all data from the source table.
+        When key fields are given, only the differences are written instead,
+        see synctable.
 
         Args:
             sourcetable (str): Path to the source table containing new data
+            keyfields (str or list, optional): Field(s) identifying a row in both
+                tables. If given, the tables are synchronised incrementally
+
+        Returns:
+            dict: Row counts of synctable when keyfields is given, otherwise None
 
         Raises:
             arcpy.ExecuteError: If any ArcPy operation fails
@@ -82,6 +93,18 @@ class mytable:
                - Non-versioned: TruncateTable (faster performance)
             3. Append new data from source table using NO_TEST schema matching
         """
+        if keyfields:
+            return self.synctable(sourcetable, keyfields)
+
+        self._reload(sourcetable)
+
+    def _reload(self, sourcetable):
+        """
+        Replace all rows of the target table with those of a source table.
+
+        Args:
+            sourcetable (str): Path to the source table containing new data
+        """
         if self.isversioned:
             arcpy.DeleteRows_management(self.table)
             arcpy.Append_management(sourcetable, self.table, "NO_TEST", "", "")
@@ -89,3 +112,215 @@ class mytable:
             print ("not versioned " + sourcetable)
             arcpy.TruncateTable_management(self.table)
             arcpy.Append_management(sourcetable, self.table, "NO_TEST", "", "")
+
+    def synctable(self, sourcetable, keyfields, batchsize=10000):
+        """
+        Synchronise the target table with a source table, writing only the differences.
+
+        Rows are matched on the key fields and compared by a hash of their
+        contents (all editable fields both tables share, plus the geometry).
+        Both tables are read once into key-to-hash maps. Only when there are
+        differences are the changed source rows read again and written:
+        changed rows are updated, new rows inserted, and rows missing from
+        the source, or repeating a key, deleted. Versioned tables are edited
+        in an edit session, so unchanged rows never reach the delta tables.
+        The session is the chunked one of myfeatureclass.editsession, and an
+        edit session already open on the workspace is joined.
+
+        Geometry is compared as stored, so when the two tables have different
+        spatial references the rows are reloaded with Append instead, which
+        projects them.
+
+        Args:
+            sourcetable (str): Path to the source table containing new data
+            keyfields (str or list): Field(s) identifying a row in both tables
+            batchsize (int): Rows per edit operation of the edit session
+
+        Returns:
+            dict: Number of rows 'inserted', 'updated', 'deleted' and 'unchanged'
+
+        Raises:
+            ValueError: If a key field is not shared by both tables
+            arcpy.ExecuteError: If any ArcPy operation fails
+        """
+        if isinstance(keyfields, str):
+            keyfields = [keyfields]
+
+        fields = self._syncfields(sourcetable)
+        lowerfields = [field.lower() for field in fields]
+        missing = [key for key in keyfields if key.lower() not in lowerfields]
+        if missing:
+            raise ValueError(f"Key field(s) {', '.join(missing)} not in both {self.table} and {sourcetable}")
+        keyindexes = [lowerfields.index(key.lower()) for key in keyfields]
+
+        if 'SHAPE@WKB' in fields and not _samespatialreference(
+                arcpy.Describe(sourcetable).spatialReference, arcpy.Describe(self.table).spatialReference):
+            before = int(arcpy.GetCount_management(self.table).getOutput(0))
+            self._reload(sourcetable)
+            after = int(arcpy.GetCount_management(self.table).getOutput(0))
+            print(f"{self.basename} reloaded from {sourcetable}, whose spatial reference differs: "
+                  f"{after} inserted, {before} deleted")
+            return {'inserted': after, 'updated': 0, 'deleted': before, 'unchanged': 0}
+
+        with arcpy.da.SearchCursor(sourcetable, fields) as sourcecursor:
+            with arcpy.da.SearchCursor(self.table, fields) as targetcursor:
+                sourcekeys, updates, inserts, deletes, unchanged = _diffrows(sourcecursor, targetcursor,
+                                                                             keyindexes)
+        counts = {'inserted': len(inserts), 'updated': len(updates), 'deleted': deletes, 'unchanged': unchanged}
+
+        if updates or inserts or deletes:
+            # Read only the source rows that have to be written
+            sourcerows = {}
+            if updates or inserts:
+                with arcpy.da.SearchCursor(sourcetable, fields) as cursor:
+                    for row in cursor:
+                        key = _rowkey(row, keyindexes)
+                        if (key in updates or key in inserts) and key not in sourcerows:
+                            sourcerows[key] = row
+
+            workspace = self._workspace()
+            if self.isversioned or myfeatureclass.activesession(workspace):
+                edit = myfeatureclass.editsession(workspace, batchsize)
+            else:
+                edit = contextlib.nullcontext()
+
+            with edit as session:
+                if updates or deletes:
+                    seen = set()
+                    with arcpy.da.UpdateCursor(self.table, fields) as cursor:
+                        for row in cursor:
+                            key = _rowkey(row, keyindexes)
+                            written = True
+                            if key in seen or key not in sourcekeys:
+                                cursor.deleteRow()
+                            elif key in updates:
+                                cursor.updateRow(sourcerows[key])
+                            else:
+                                written = False
+                            seen.add(key)
+                            if written and session:
+                                session.rowwritten()
+
+                if inserts:
+                    with arcpy.da.InsertCursor(self.table, fields) as cursor:
+                        for key in inserts:
+                            cursor.insertRow(sourcerows[key])
+                            if session:
+                                session.rowwritten()
+
+        print(f"{self.basename} synchronised with {sourcetable}: {counts['inserted']} inserted, "
+              f"{counts['updated']} updated, {counts['deleted']} deleted, {counts['unchanged']} unchanged")
+        return counts
+
+    def _workspace(self):
+        """
+        Get the geodatabase holding the table.
+
+        Returns:
+            str: The workspace path, which is the parent of the table's
+                 feature dataset if it is in one
+        """
+        if arcpy.Describe(self.path).dataType == "FeatureDataset":
+            return os.path.dirname(self.path)
+        return self.path
+
+    def _syncfields(self, sourcetable):
+        """
+        Get the fields synchronised between the target and a source table.
+
+        Args:
+            sourcetable (str): Path to the source table
+
+        Returns:
+            list: Editable attribute fields present in both tables, plus
+                  SHAPE@WKB if both have a geometry
+        """
+        sourcefields = {field.name.lower() for field in arcpy.ListFields(sourcetable)}
+        fields = [field.name for field in arcpy.ListFields(self.table)
+                  if field.editable and field.name.lower() in sourcefields and
+                  field.type not in ('OID', 'GlobalID', 'Geometry', 'Blob', 'Raster')]
+        if hasattr(arcpy.Describe(self.table), 'shapeType') and hasattr(arcpy.Describe(sourcetable), 'shapeType'):
+            fields.append('SHAPE@WKB')
+        return fields
+
+
+def _rowkey(row, keyindexes):
+    """
+    Get the key of a row.
+
+    Args:
+        row (tuple): Row values
+        keyindexes (list): Positions of the key fields in the row
+
+    Returns:
+        tuple: Values of the key fields
+    """
+    return tuple(row[index] for index in keyindexes)
+
+
+def _rowhash(row):
+    """
+    Hash the contents of a row.
+
+    Args:
+        row (tuple): Row values
+
+    Returns:
+        bytes: SHA-1 digest of the row
+    """
+    return hashlib.sha1(repr(row).encode('utf-8')).digest()
+
+
+def _diffrows(sourcerows, targetrows, keyindexes):
+    """
+    Compare the rows of a source and a target table by key.
+
+    The source rows are read first into a map of key to row hash, where
+    the first of duplicate keys wins. Target rows whose key is missing
+    from the source, or repeats that of an earlier target row, are to be
+    deleted; the other target rows are updated if their hash differs.
+
+    Args:
+        sourcerows (iterable): Source rows
+        targetrows (iterable): Target rows, with the same fields in the same order
+        keyindexes (list): Positions of the key fields in the rows
+
+    Returns:
+        tuple: The set of source keys, the set of keys to update, the set of
+               keys to insert, the number of target rows to delete and the
+               number of unchanged target rows
+    """
+    sourcehashes = {}
+    for row in sourcerows:
+        sourcehashes.setdefault(_rowkey(row, keyindexes), _rowhash(row))
+
+    updates = set()
+    deletes = 0
+    unchanged = 0
+    seen = set()
+    for row in targetrows:
+        key = _rowkey(row, keyindexes)
+        if key in seen or key not in sourcehashes:
+            deletes += 1
+        elif sourcehashes[key] != _rowhash(row):
+            updates.add(key)
+        else:
+            unchanged += 1
+        seen.add(key)
+    return set(sourcehashes), updates, set(sourcehashes) - seen, deletes, unchanged
+
+
+def _samespatialreference(first, second):
+    """
+    Check whether two spatial references describe the same coordinate system.
+
+    Args:
+        first: arcpy.SpatialReference
+        second: arcpy.SpatialReference
+
+    Returns:
+        bool: True if geometry in one needs no projection to the other
+    """
+    if first.factoryCode and second.factoryCode:
+        return first.factoryCode == second.factoryCode
+    return first.name == second.name
@@ -0,0 +1,64 @@
+import types
+import unittest
+
+import mytable
+
+
+class DiffRowsTest(unittest.TestCase):
+
+    TARGET = [(1, "a", 10), (2, "b", 20), (3, "c", 30)]
+
+    def diff(self, source, target=None, keyindexes=(0,)):
+        return mytable._diffrows(source, self.TARGET if target is None else target, list(keyindexes))
+
+    def test_unchanged(self):
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff(list(self.TARGET))
+        self.assertEqual(sourcekeys, {(1,), (2,), (3,)})
+        self.assertEqual((updates, inserts, deletes, unchanged), (set(), set(), 0, 3))
+
+    def test_inserts_updates_and_deletes(self):
+        source = [(1, "a", 10), (2, "B", 20), (4, "d", 40)]
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff(source)
+        self.assertEqual(sourcekeys, {(1,), (2,), (4,)})
+        self.assertEqual(updates, {(2,)})
+        self.assertEqual(inserts, {(4,)})
+        self.assertEqual((deletes, unchanged), (1, 1))
+
+    def test_duplicate_keys(self):
+        # The first source row of a key wins; later target rows of a key are deleted
+        source = [(1, "a", 10), (1, "x", 99)]
+        target = [(1, "a", 10), (1, "a", 10), (1, "y", 0)]
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff(source, target)
+        self.assertEqual((updates, inserts, deletes, unchanged), (set(), set(), 2, 1))
+
+    def test_composite_key(self):
+        source = [(1, "a", 10), (1, "b", 11)]
+        target = [(1, "a", 10), (1, "c", 12)]
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff(source, target, keyindexes=(0, 1))
+        self.assertEqual(inserts, {(1, "b")})
+        self.assertEqual((updates, deletes, unchanged), (set(), 1, 1))
+
+    def test_empty_tables(self):
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff([], [])
+        self.assertEqual((sourcekeys, updates, inserts, deletes, unchanged), (set(), set(), set(), 0, 0))
+
+        sourcekeys, updates, inserts, deletes, unchanged = self.diff([])
+        self.assertEqual((inserts, deletes), (set(), 3))
+
+
+class SameSpatialReferenceTest(unittest.TestCase):
+
+    def sr(self, factoryCode, name):
+        return types.SimpleNamespace(factoryCode=factoryCode, name=name)
+
+    def test_factory_codes(self):
+        self.assertTrue(mytable._samespatialreference(self.sr(2193, "NZGD2000"), self.sr(2193, "Other")))
+        self.assertFalse(mytable._samespatialreference(self.sr(2193, "NZGD2000"), self.sr(4326, "WGS84")))
+
+    def test_custom_by_name(self):
+        self.assertTrue(mytable._samespatialreference(self.sr(0, "Local"), self.sr(0, "Local")))
+        self.assertFalse(mytable._samespatialreference(self.sr(0, "Local"), self.sr(2193, "NZGD2000")))
+
+
+if __name__ == "__main__":
+    unittest.main()
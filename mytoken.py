@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
+
+
+# ArcGIS REST error codes for an expired/invalid token and a missing token
+INVALID_TOKEN_CODES = (498, 499)
+
+
+def loadConfig() -> Dict[str, Any]:
+    """
+    Load configuration from config.json file.
+
+    Returns:
+        Dictionary containing myToken configuration
+    """
+    try:
+        configPath = os.path.join(os.path.dirname(__file__), 'config.json')
+        with open(configPath, 'r') as configFile:
+            config = json.load(configFile)
+
+        if 'myToken' not in config:
+            # Return empty dict if section doesn't exist
+            return {}
+
+        return config['myToken']
+
+    except FileNotFoundError:
+        print(f"Warning: Config file not found: {configPath}")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Warning: Invalid JSON in config file: {str(e)}")
+        return {}
+
+
+def isInvalidTokenError(response: Dict[str, Any]) -> bool:
+    """
+    Check whether a JSON response is an invalid or expired token error.
+
+    Handles both the ArcGIS Online/Portal form ({"error": {"code": 498}})
+    and the ArcGIS Server admin form ({"status": "error", "code": 498}).
+
+    Args:
+        response: Parsed JSON response
+
+    Returns:
+        True if the request should be re-issued with a new token
+    """
+    if not isinstance(response, dict):
+        return False
+    error = response.get('error')
+    if isinstance(error, dict) and error.get('code') in INVALID_TOKEN_CODES:
+        return True
+    return response.get('status') == 'error' and response.get('code') in INVALID_TOKEN_CODES
+
+
+class TokenManager:
+    """
+    Cache of authentication tokens shared by the AGOL, Portal and Server clients.
+
+    Tokens are cached per (host, username) together with their expiry time,
+    in memory and optionally in a JSON file so they survive between script
+    runs. The file holds live credentials: it is created readable by its
+    owner only on POSIX, but on Windows it inherits the permissions of its
+    directory, so it should be kept in a per-user directory such as
+    ~/.arcgis rather than a shared one. A background timer fetches a new token refreshMargin seconds
+    before the cached one expires, so long running jobs never send an
+    expired token.
+
+    Attributes:
+        cachePath (str): Path of the on-disk token cache, or None for memory only
+        refreshMargin (float): Seconds before expiry at which a token is renewed
+    """
+
+    def __init__(self, cachePath: Optional[str] = None, refreshMargin: float = 300):
+        """
+        Initialize the token manager.
+
+        Args:
+            cachePath: Path of the on-disk token cache, "~" expanding to the user's
+                       home directory. If None, tokens are only kept in memory
+            refreshMargin: Seconds before expiry at which a token is renewed
+        """
+        self.cachePath = os.path.expanduser(cachePath) if cachePath else None
+        self.refreshMargin = refreshMargin
+        self._tokens = self._load()
+        self._timers = {}
+        self._lock = threading.RLock()
+
+    def getToken(self, host: str, username: str, fetch: Callable[[], Tuple[str, float]],
+                 invalidToken: Optional[str] = None) -> str:
+        """
+        Get a valid token, fetching a new one only when needed.
+
+        Args:
+            host: Host (or base URL) the token is issued by
+            username: User the token is issued to
+            fetch: Function that generates a new token and returns (token, expires),
+                   with expires in epoch seconds
+            invalidToken: Token the server just rejected. It is replaced even if
+                          not yet expired; a token already replaced by another
+                          thread is returned as is
+
+        Returns:
+            Authentication token
+        """
+        key = f"{host}|{username}"
+        with self._lock:
+            cached = self._tokens.get(key)
+            if (cached is None or cached['token'] == invalidToken or
+                    cached['expires'] - self.refreshMargin <= time.time()):
+                cached = self._fetch(key, fetch)
+            elif key not in self._timers:
+                self._schedule(key, fetch)
+            return cached['token']
+
+    def invalidate(self, host: str, username: str) -> None:
+        """
+        Drop the cached token of a host and user.
+
+        Args:
+            host: Host (or base URL) the token is issued by
+            username: User the token is issued to
+        """
+        key = f"{host}|{username}"
+        with self._lock:
+            self._tokens.pop(key, None)
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            self._save()
+
+    def _fetch(self, key: str, fetch: Callable[[], Tuple[str, float]]) -> Dict[str, Any]:
+        token, expires = fetch()
+        cached = {'token': token, 'expires': expires}
+        self._tokens[key] = cached
+        self._save()
+        self._schedule(key, fetch)
+        return cached
+
+    def _schedule(self, key: str, fetch: Callable[[], Tuple[str, float]]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+        delay = min(max(self._tokens[key]['expires'] - self.refreshMargin - time.time(), 0),
+                    threading.TIMEOUT_MAX)
+        timer = threading.Timer(delay, self._refresh, (key, fetch))
+        timer.daemon = True
+        self._timers[key] = timer
+        timer.start()
+
+    def _refresh(self, key: str, fetch: Callable[[], Tuple[str, float]]) -> None:
+        with self._lock:
+            self._timers.pop(key, None)
+            try:
+                self._fetch(key, fetch)
+            except (Exception, SystemExit) as e:
+                # Fetch functions may sys.exit() on failure, which would end only
+                # this timer thread; the next getToken call fetches synchronously instead
+                print(f"Warning: Background token refresh failed: {str(e) or type(e).__name__}")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cachePath or not os.path.exists(self.cachePath):
+            return {}
+        try:
+            with open(self.cachePath, 'r') as cacheFile:
+                tokens = json.load(cacheFile)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {key: value for key, value in tokens.items() if value.get('expires', 0) > now}
+
+    def _save(self) -> None:
+        if not self.cachePath:
+            return
+        tempPath = self.cachePath + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cachePath) or '.', exist_ok=True)
+            fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as cacheFile:
+                json.dump(self._tokens, cacheFile)
+            os.replace(tempPath, self.cachePath)
+        except OSError as e:
+            print(f"Warning: Could not write token cache {self.cachePath}: {str(e)}")
+
+
+_tokenManager = None
+_tokenManagerLock = threading.Lock()
+
+
+def getTokenManager(config: Optional[Dict[str, Any]] = None) -> TokenManager:
+    """
+    Get the token manager shared by every client in this process.
+
+    Args:
+        config: myToken configuration dictionary. If None, will load from config.json.
+                Only used when the shared manager is first created
+
+    Returns:
+        The shared TokenManager
+    """
+    global _tokenManager
+    with _tokenManagerLock:
+        if _tokenManager is None:
+            if config is None:
+                config = loadConfig()
+            _tokenManager = TokenManager(config.get('cachePath'), config.get('refreshMargin', 300))
+        return _tokenManager
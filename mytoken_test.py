@@ -0,0 +1,168 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mytoken
+
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    """
+    A generateToken endpoint issuing numbered tokens.
+
+    Each token lives for the next of the server's 'lifetimes' in seconds,
+    or an hour once they run out, and each request takes 'delay' seconds.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        time.sleep(server.delay)
+        with server.lock:
+            server.requests += 1
+            lifetime = server.lifetimes.pop(0) if server.lifetimes else 3600
+            body = json.dumps({'token': 'token{}'.format(server.requests),
+                               'expires': (time.time() + lifetime) * 1000}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TokenManagerTest(unittest.TestCase):
+
+    HOST = "https://example.com/sharing/rest"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _TokenHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = 0
+        self.server.lifetimes = []
+        self.server.delay = 0
+        self.tempDir = tempfile.mkdtemp()
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            for timer in list(manager._timers.values()):
+                timer.cancel()
+        shutil.rmtree(self.tempDir)
+
+    def manager(self, **kwargs):
+        manager = mytoken.TokenManager(**kwargs)
+        self.managers.append(manager)
+        return manager
+
+    def fetch(self):
+        url = "http://127.0.0.1:{}/generateToken".format(self.server.server_port)
+        with urllib.request.urlopen(url, b'f=json') as response:
+            token = json.load(response)
+        return token['token'], token['expires'] / 1000.0
+
+    def test_cached_token_is_reused(self):
+        manager = self.manager()
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+        self.assertEqual(manager.getToken(self.HOST, "other", self.fetch), "token2")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_token_inside_refresh_margin_is_replaced(self):
+        manager = self.manager(refreshMargin=300)
+        manager._tokens[f"{self.HOST}|user"] = {'token': "old", 'expires': time.time() + 100}
+
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+        self.assertEqual(self.server.requests, 1)
+
+    def test_timer_refreshes_before_expiry(self):
+        self.server.lifetimes = [1.3]
+        manager = self.manager(refreshMargin=1)
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+
+        deadline = time.time() + 5
+        while self.server.requests < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token2")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_invalid_token_is_replaced_once(self):
+        manager = self.manager()
+        token = manager.getToken(self.HOST, "user", self.fetch)
+
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch, invalidToken=token), "token2")
+        # A second thread rejected the same token: it is already replaced
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch, invalidToken=token), "token2")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_concurrent_callers_fetch_once(self):
+        self.server.delay = 0.2
+        manager = self.manager()
+        tokens = []
+
+        def worker():
+            tokens.append(manager.getToken(self.HOST, "user", self.fetch))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tokens, ["token1"] * 8)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_failed_refresh_is_reported(self):
+        manager = self.manager()
+        manager.getToken(self.HOST, "user", self.fetch)
+
+        def fetch():
+            sys.exit()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            manager._refresh(f"{self.HOST}|user", fetch)
+        self.assertIn("Background token refresh failed", output.getvalue())
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+
+    def test_cache_file_survives_restart(self):
+        cachePath = os.path.join(self.tempDir, "tokens.json")
+        self.manager(cachePath=cachePath).getToken(self.HOST, "user", self.fetch)
+
+        manager = self.manager(cachePath=cachePath)
+        self.assertEqual(manager.getToken(self.HOST, "user", self.fetch), "token1")
+        self.assertEqual(self.server.requests, 1)
+        if os.name == 'posix':
+            self.assertEqual(os.stat(cachePath).st_mode & 0o777, 0o600)
+
+
+class IsInvalidTokenErrorTest(unittest.TestCase):
+
+    def test_response_forms(self):
+        self.assertTrue(mytoken.isInvalidTokenError({'error': {'code': 498, 'message': "Invalid token."}}))
+        self.assertTrue(mytoken.isInvalidTokenError({'status': 'error', 'code': 499}))
+        self.assertFalse(mytoken.isInvalidTokenError({'error': {'code': 400}}))
+        self.assertFalse(mytoken.isInvalidTokenError([]))
+
+
+if __name__ == "__main__":
+    unittest.main()